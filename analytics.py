@@ -0,0 +1,294 @@
+"""Spending trends and anomalies, computed in bulk with NumPy.
+
+Everything works on a SpendingMatrix: cents spent per (period x category)
+and earned per period, built either from the YearData aggregates or from
+the raw rows of the transaction store. Periods are consecutive months, or
+weeks when built from raw rows with weekly=True, with no gaps, so a row
+offset is a fixed number of periods.
+"""
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+
+from objects import MONTH_NAMES, get_category_data
+from transaction_store import DEPOSIT, EPOCH_ORDINAL
+
+# Robust z-score: 0.6745 * (x - median) / MAD is comparable to a z-score
+MAD_SCALE = 0.6745
+# Used when more than half the history is one value and the MAD is 0
+MEAN_DEVIATION_SCALE = 0.7979
+REPORT_CACHE_SIZE = 8
+
+report_cache = OrderedDict()
+
+
+class SpendingMatrix:
+    def __init__(self, first_period, categories, spent, earned, weekly=False):
+        self.first_period = first_period
+        self.categories = categories
+        self.spent = spent      # int64 cents, shape (periods, categories)
+        self.earned = earned    # int64 cents, shape (periods,)
+        self.weekly = weekly
+        self.results = {}
+
+    def memo(self, key, build):
+        # A matrix is never modified, so each result is computed at most once
+        if key not in self.results:
+            self.results[key] = build()
+        return self.results[key]
+
+    @classmethod
+    def from_years(cls, year_list):
+        """Monthly matrix of some YearData, e.g. every year of one account."""
+        categories = list(get_category_data()["categories"])
+        for year_data in year_list:
+            for category in year_data.category_cents:
+                if category not in categories:
+                    categories.append(category)
+        if not year_list:
+            return cls(0, categories, np.zeros((0, len(categories)), dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+        columns = {category: i for i, category in enumerate(categories)}
+        first_year = min(year_data.year for year_data in year_list)
+        last_year = max(year_data.year for year_data in year_list)
+        spent = np.zeros(((last_year - first_year + 1) * 12, len(categories)), dtype=np.int64)
+        earned = np.zeros(len(spent), dtype=np.int64)
+        for year_data in year_list:
+            for index, month in enumerate(year_data.months):
+                row = (year_data.year - first_year) * 12 + index
+                earned[row] += month.earned_cents
+                for category, cents in month.category_cents.items():
+                    spent[row, columns[category]] += cents
+        return cls(first_year * 12, categories, spent, earned).trimmed()
+
+    @classmethod
+    def from_store(cls, store, account=None, weekly=False):
+        """Matrix of the raw rows in a TransactionStore, for one account or all of them."""
+        days = store.column("date").astype(np.int64)
+        amounts = store.column("amount").astype(np.int64)
+        categories = store.column("category").astype(np.int64)
+        if account is not None:
+            in_account = np.array([source_account == account for source_account in store.source_accounts] or [False])
+            rows = in_account[store.column("source")]
+            days, amounts, categories = days[rows], amounts[rows], categories[rows]
+        if not len(days):
+            return cls(0, list(store.categories), np.zeros((0, len(store.categories)), dtype=np.int64),
+                       np.zeros(0, dtype=np.int64), weekly)
+
+        if weekly:
+            # Weeks start on Monday; the epoch was a Thursday
+            periods = (days + 3) // 7
+        else:
+            periods = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) + 1970 * 12
+        first = int(periods.min())
+        offsets = periods - first
+        count = int(offsets.max()) + 1
+
+        is_deposit = categories == DEPOSIT
+        spent = np.zeros((count, len(store.categories)), dtype=np.int64)
+        np.add.at(spent, (offsets[~is_deposit], categories[~is_deposit]), amounts[~is_deposit])
+        earned = np.zeros(count, dtype=np.int64)
+        np.add.at(earned, offsets[is_deposit], amounts[is_deposit])
+        return cls(first, list(store.categories), spent, earned, weekly)
+
+    def trimmed(self):
+        """Drop the empty periods before the first and after the last one with data."""
+        active = np.nonzero(self.spent.any(axis=1) | (self.earned != 0))[0]
+        if not len(active):
+            return SpendingMatrix(self.first_period, self.categories, self.spent[:0], self.earned[:0], self.weekly)
+        start, end = int(active[0]), int(active[-1]) + 1
+        return SpendingMatrix(self.first_period + start, self.categories, self.spent[start:end],
+                              self.earned[start:end], self.weekly)
+
+    def __len__(self):
+        return len(self.spent)
+
+    def covers(self, other):
+        """Whether this matrix has the same spending per category and earnings as other over other's periods."""
+        start = other.first_period - self.first_period
+        if self.weekly != other.weekly or start < 0 or start + len(other) > len(self):
+            return False
+        rows = slice(start, start + len(other))
+        if not np.array_equal(self.earned[rows], other.earned):
+            return False
+        # Categories are compared by name, since the two matrices may order them differently
+        mine = dict(zip(self.categories, self.spent[rows].T))
+        theirs = dict(zip(other.categories, other.spent.T))
+        for category in set(mine) | set(theirs):
+            spent = mine.get(category)
+            other_spent = theirs.get(category)
+            if spent is None or other_spent is None:
+                if (spent if other_spent is None else other_spent).any():
+                    return False
+            elif not np.array_equal(spent, other_spent):
+                return False
+        return True
+
+    def period_label(self, row):
+        period = self.first_period + row
+        if self.weekly:
+            return "Week of " + (date.fromordinal(EPOCH_ORDINAL) + timedelta(days=period * 7 - 3)).isoformat()
+        return f"{MONTH_NAMES[period % 12]} {period // 12}"
+
+    def row_of(self, year, month):
+        """Row of a month in a monthly matrix, or None if it is outside the data."""
+        row = year * 12 + month - 1 - self.first_period
+        return row if 0 <= row < len(self) else None
+
+    # ---------------- Trends ----------------
+    def totals(self):
+        return self.memo("totals", lambda: self.spent.sum(axis=1))
+
+    def period_changes(self):
+        """Change from the previous period in cents, and as a fraction (nan where the previous was 0)."""
+        return self.memo("changes", self.compute_period_changes)
+
+    def compute_period_changes(self):
+        change = np.zeros_like(self.spent)
+        change[1:] = self.spent[1:] - self.spent[:-1]
+        previous = np.zeros(self.spent.shape, dtype=np.float64)
+        previous[1:] = self.spent[:-1]
+        previous[0] = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(previous != 0, change / previous, np.nan)
+        return change, fraction
+
+    def rolling_mean(self, window):
+        """Mean of each period and the window - 1 before it; shorter at the start."""
+        sums = np.cumsum(np.vstack([np.zeros((1, self.spent.shape[1]), dtype=np.int64), self.spent]), axis=0)
+        counts = np.minimum(np.arange(1, len(self) + 1), window)[:, None]
+        return (sums[1:] - sums[np.maximum(np.arange(1, len(self) + 1) - window, 0)]) / counts
+
+    def rolling_percentiles(self, window, percentiles=(25, 50, 75)):
+        """Percentiles of each window-long run of periods, shape (percentiles, periods, categories).
+
+        Periods with fewer than window periods of history are nan.
+        """
+        result = np.full((len(percentiles), len(self), self.spent.shape[1]), np.nan)
+        if len(self) >= window:
+            windows = np.lib.stride_tricks.sliding_window_view(self.spent, window, axis=0)
+            result[:, window - 1:] = np.percentile(windows, percentiles, axis=-1)
+        return result
+
+    def shares(self):
+        """Each category's fraction of the period's spending (0 for periods without any)."""
+        return self.memo("shares", self.compute_shares)
+
+    def compute_shares(self):
+        totals = self.totals()[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals > 0, self.spent / np.maximum(totals, 1), 0.0)
+
+    def share_trends(self, window=12):
+        """Least-squares slope of each category's share over the last window periods, per period."""
+        shares = self.shares()[-window:]
+        if len(shares) < 2:
+            return np.zeros(self.spent.shape[1])
+        x = np.arange(len(shares), dtype=np.float64)
+        x -= x.mean()
+        return (x[:, None] * (shares - shares.mean(axis=0))).sum(axis=0) / (x ** 2).sum()
+
+    # ---------------- Anomalies ----------------
+    def anomaly_scores(self, window=12, method="mad"):
+        """Score every period against the window periods before it, per category.
+
+        "zscore" uses the mean and standard deviation of that history, "mad"
+        the median and median absolute deviation, which a single earlier
+        spike does not drag along. Periods with too little history, or a
+        history with no spread at all, score nan.
+        """
+        return self.memo(("scores", window, method), lambda: self.compute_anomaly_scores(window, method))
+
+    def compute_anomaly_scores(self, window, method):
+        scores = np.full(self.spent.shape, np.nan)
+        if len(self) <= window:
+            return scores
+        history = np.lib.stride_tricks.sliding_window_view(self.spent[:-1], window, axis=0).astype(np.float64)
+        current = self.spent[window:].astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if method == "zscore":
+                spread = history.std(axis=-1)
+                scores[window:] = np.where(spread > 0, (current - history.mean(axis=-1)) / spread, np.nan)
+            elif method == "mad":
+                median = np.median(history, axis=-1)
+                deviations = np.abs(history - median[..., None])
+                mad = np.median(deviations, axis=-1)
+                mean_deviation = deviations.mean(axis=-1)
+                robust = np.where(mad > 0, MAD_SCALE * (current - median) / mad,
+                                  MEAN_DEVIATION_SCALE * (current - median) / mean_deviation)
+                scores[window:] = np.where((mad > 0) | (mean_deviation > 0), robust, np.nan)
+            else:
+                raise ValueError(f"Unknown anomaly method: {method}")
+        return scores
+
+    def anomalies(self, window=12, method="mad", threshold=3.5, rows=None):
+        """Cells scoring above threshold (spending spikes only), highest score first."""
+        scores = self.anomaly_scores(window, method).copy()
+        if rows is not None:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[rows] = True
+            scores[~mask] = np.nan
+        with np.errstate(invalid='ignore'):
+            found = np.argwhere(scores > threshold)
+        order = np.argsort(-scores[found[:, 0], found[:, 1]]) if len(found) else []
+        return [{
+            "period": self.period_label(int(row)),
+            "category": self.categories[column],
+            "spent": int(self.spent[row, column]) / 100,
+            "score": round(float(scores[row, column]), 2),
+        } for row, column in (found[i] for i in order)]
+
+    def report(self, window=12, method="mad", threshold=3.5, top=10):
+        """Summary of the latest period and the history, as plain numbers for the GUI or JSON."""
+        return self.memo(("report", window, method, threshold, top),
+                         lambda: self.compute_report(window, method, threshold, top))
+
+    def compute_report(self, window, method, threshold, top):
+        if not len(self):
+            return None
+        change, fraction = self.period_changes()
+        latest = len(self) - 1
+        mean = self.rolling_mean(3)[latest]
+        quartiles = self.rolling_percentiles(min(window, len(self)))[:, latest]
+        trends = self.share_trends(window)
+        total_change = int(self.totals()[latest] - (self.totals()[latest - 1] if latest else 0))
+        return {
+            "period": self.period_label(latest),
+            "periods": len(self),
+            "total_spent": int(self.totals()[latest]) / 100,
+            "total_change": total_change / 100,
+            "categories": {category: {
+                "spent": int(self.spent[latest, i]) / 100,
+                "change": int(change[latest, i]) / 100,
+                "change_fraction": None if np.isnan(fraction[latest, i]) else round(float(fraction[latest, i]), 4),
+                "rolling_mean_3": round(float(mean[i]) / 100, 2),
+                "percentiles": [round(float(value) / 100, 2) for value in quartiles[:, i]],
+                "share": round(float(self.shares()[latest, i]), 4),
+                "share_trend": round(float(trends[i]), 5),
+            } for i, category in enumerate(self.categories)},
+            "anomalies": self.anomalies(window, method, threshold)[:top],
+        }
+
+
+def cached(key, build):
+    """build() once per key; callers put the data version in the key, so stale entries are never hit."""
+    if key in report_cache:
+        report_cache.move_to_end(key)
+        return report_cache[key]
+    value = report_cache[key] = build()
+    while len(report_cache) > REPORT_CACHE_SIZE:
+        report_cache.popitem(last=False)
+    return value
+
+
+def years_matrix(year_list):
+    """SpendingMatrix of some YearData, reused until any of them changes."""
+    key = ("years", tuple(sorted((year_data.account, year_data.year, year_data.version) for year_data in year_list)))
+    return cached(key, lambda: SpendingMatrix.from_years(year_list))
+
+
+def store_matrix(store, account=None, weekly=False):
+    """SpendingMatrix of the transaction store, reused until rows are added or recategorized."""
+    key = ("store", id(store), store.version, len(store), len(store.categories), account, weekly)
+    return cached(key, lambda: SpendingMatrix.from_store(store, account, weekly))
@@ -0,0 +1,306 @@
+"""Local HTTP API over the dashboard data, for scripts and browser pages that don't need the GUI.
+
+    python api_server.py [--host 127.0.0.1] [--port 8765]
+
+    GET  /accounts
+    GET  /years[?account=NAME]
+    GET  /years/2024[?account=NAME]                 year totals with every month and category
+    GET  /years/2024/months/3[?account=NAME]        month totals (the month may also be a name)
+    GET  /categories[?year=2024[&month=3]][&account=NAME]
+    POST /upload[?account=NAME]                     body: one statement PDF
+
+The data is loaded into memory once at startup and every response is
+served from AllData. JSON bodies are cached until data_version changes,
+which happens whenever an upload adds transactions. Each carries an ETag
+(a hash of the body), and a request whose If-None-Match matches gets a 304
+without a body. Uploads run through backend.import_files on a worker
+thread, one at a time, with unknown merchants going to the review queue as
+in cli.py. Imports made by another process while the server runs are not
+picked up until it restarts.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from backend import import_files, load_user_data
+from objects import DEFAULT_ACCOUNT, MONTH_INDEXES, MONTH_NAMES
+from review_queue import ReviewQueue
+
+RESPONSE_CACHE_SIZE = 256
+MAX_HEADER_LINES = 100
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiServer:
+    def __init__(self, user_data, review_queue):
+        self.user_data = user_data
+        self.review_queue = review_queue
+        self.data_version = 0
+        self.responses = OrderedDict()  # (path, query) -> (data_version, etag, body)
+        self.upload_lock = None
+        self.loop = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.loop = asyncio.get_running_loop()
+        self.upload_lock = asyncio.Lock()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    # ---------------- HTTP ----------------
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                status, response_headers, response_body = await self.respond(method, target, headers, body)
+                self.write_response(writer, status, response_headers, response_body, keep_alive,
+                                    send_body=method != "HEAD")
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ApiError as e:
+            # The request itself was malformed; answer and drop the connection
+            self.write_response(writer, e.status, {}, json_body({"error": str(e)}), False)
+            with contextlib.suppress(ConnectionError):
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def read_request(self, reader):
+        """Return (method, target, headers, body, keep_alive), or None once the client closed the connection."""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "malformed request line")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "too many headers")
+
+        length = parse_int(headers.get("content-length") or "0", "Content-Length")
+        if length < 0:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "negative Content-Length")
+        if length > MAX_UPLOAD_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method.upper(), target, headers, body, keep_alive
+
+    def write_response(self, writer, status, headers, body, keep_alive, send_body=True):
+        status = HTTPStatus(status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        headers = dict(headers)
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(len(body or b""))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        writer.write(head + body if body and send_body else head)
+
+    async def respond(self, method, target, headers, body):
+        """Return (status, headers, body) for one request."""
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if method == "POST" and path == "/upload":
+                stats = await self.upload(body, query)
+                return HTTPStatus.OK, {}, json_body(stats)
+            if method not in ("GET", "HEAD"):
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported here")
+
+            etag, response_body = self.cached_get(path, query)
+            response_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if etag_matches(headers.get("if-none-match"), etag):
+                return HTTPStatus.NOT_MODIFIED, response_headers, None
+            return HTTPStatus.OK, response_headers, response_body
+        except ApiError as e:
+            return e.status, {}, json_body({"error": str(e)})
+        except Exception as e:
+            print(f"Error handling {method} {target}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {}, json_body({"error": str(e)})
+
+    def cached_get(self, path, query):
+        """(etag, body) of a GET, from the cache unless the data changed since it was built."""
+        key = (path, tuple(sorted(query.items())))
+        cached = self.responses.get(key)
+        if cached is not None and cached[0] == self.data_version:
+            self.responses.move_to_end(key)
+            return cached[1], cached[2]
+
+        body = json_body(self.get(path, query))
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.responses[key] = (self.data_version, etag, body)
+        self.responses.move_to_end(key)
+        while len(self.responses) > RESPONSE_CACHE_SIZE:
+            self.responses.popitem(last=False)
+        return etag, body
+
+    # ---------------- Endpoints ----------------
+    def get(self, path, query):
+        parts = path.strip("/").split("/")
+        account = query.get("account", DEFAULT_ACCOUNT)
+        if parts == ["accounts"]:
+            return {"accounts": self.user_data.get_accounts()}
+        if parts == ["years"]:
+            return {"account": account, "years": self.user_data.get_years(account)}
+        if len(parts) == 2 and parts[0] == "years":
+            return self.year(account, parts[1]).to_dict()
+        if len(parts) == 4 and parts[0] == "years" and parts[2] == "months":
+            year_data = self.year(account, parts[1])
+            month_data = year_data.months[parse_month(parts[3])]
+            return dict(month_data.to_dict(), account=account, year=year_data.year)
+        if parts == ["categories"]:
+            return self.categories(account, query)
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no such endpoint: {path}")
+
+    def year(self, account, year):
+        year_data = self.user_data.get_year(parse_int(year, "year"), account=account)
+        if year_data is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no data for {year}")
+        return year_data
+
+    def categories(self, account, query):
+        """Category totals of a month, a year, or every year of account."""
+        if "year" in query:
+            year_data = self.year(account, query["year"])
+            if "month" in query:
+                category_cents = year_data.months[parse_month(query["month"])].category_cents
+            else:
+                category_cents = year_data.category_cents
+        elif "month" in query:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "month needs a year")
+        else:
+            category_cents = {}
+            for year in self.user_data.get_years(account):
+                for category, cents in self.user_data.get_year(year, account=account).category_cents.items():
+                    category_cents[category] = category_cents.get(category, 0) + cents
+        return {"account": account, "year": query.get("year"), "month": query.get("month"),
+                "categories": {category: cents / 100 for category, cents in category_cents.items()}}
+
+    async def upload(self, body, query):
+        if not body:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "upload needs a PDF as the request body")
+        if not body.startswith(b"%PDF"):
+            raise ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "the request body is not a PDF")
+        account = query.get("account", DEFAULT_ACCOUNT)
+        async with self.upload_lock:
+            return await self.loop.run_in_executor(None, self.run_upload, body, account)
+
+    def run_upload(self, body, account):
+        """Import one uploaded PDF on a worker thread.
+
+        user_data, the transaction store and the database are only touched on
+        the event loop, through apply_on_loop, journal compaction included.
+        """
+        stats = {}
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "upload.pdf")
+            with open(path, "wb") as file:
+                file.write(body)
+            import_files(self.user_data, [path], self.review_queue, workers=1, progress=lambda *args: None,
+                         apply=self.apply_on_loop, stats=stats, account=account)
+        self.review_queue.save()
+        stats["review_queue"] = len(self.review_queue)
+        stats["data_version"] = self.data_version
+        stats["total_seconds"] = round(time.perf_counter() - start, 4)
+        return stats
+
+    def apply_on_loop(self, fn):
+        async def apply():
+            fn()
+            # Cached responses built before this point are now stale
+            self.data_version += 1
+        asyncio.run_coroutine_threadsafe(apply(), self.loop).result()
+
+
+def json_body(payload):
+    return json.dumps(payload).encode()
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak validators compare equal for GET
+    return "*" in candidates or etag in candidates or "W/" + etag in candidates
+
+
+def parse_int(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a number, not {value!r}")
+
+
+def parse_month(value):
+    """Month index (0-11) from a number 1-12 or a month name."""
+    if value.capitalize() in MONTH_INDEXES:
+        return MONTH_INDEXES[value.capitalize()]
+    month = parse_int(value, "month")
+    if not 1 <= month <= len(MONTH_NAMES):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"month must be 1-12, not {month}")
+    return month - 1
+
+
+async def serve(host, port, review_queue_path):
+    user_data = load_user_data()
+    # Requests are answered from memory, and uploads change user_data while other requests are served
+    user_data.load_all()
+    server = ApiServer(user_data, ReviewQueue(review_queue_path))
+    http_server = await server.start(host, port)
+    bound_host, bound_port = http_server.sockets[0].getsockname()[:2]
+    # benchmarks/http_load.py reads this line to find the port when started with --port 0
+    print(f"Serving on http://{bound_host}:{bound_port}", flush=True)
+    async with http_server:
+        await http_server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboard data over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--review-queue", default="review_queue.json", help="where unknown merchants are queued")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.review_queue))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import json
+import os
+import tempfile
+
+
+def atomic_write(path, write, mode='w'):
+    """Call write(file) so that path holds either the old or the new content.
+
+    The content is written to a temporary file in the same directory, flushed
+    to disk and then renamed over path, which is atomic on the same filesystem.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write_json(path, data, indent=4):
+    atomic_write(path, lambda file: json.dump(data, file, indent=indent))
+
+
+def atomic_write_text(path, text):
+    atomic_write(path, lambda file: file.write(text))
+
+
+def atomic_write_bytes(path, data):
+    atomic_write(path, lambda file: file.write(data), mode='wb')
@@ -1,180 +1,656 @@
 from objects import *
-from tkinter import filedialog
-import pdfplumber 
-import re
-import json
 import os
-import hashlib
-import shutil
+import time
+from datetime import MAXYEAR, MINYEAR
+import metrics
+from hash_index import HashIndex, hash_file
+from storage import open_storage
+import statement_parser
+from statement_parser import PURCHASE, DEPOSIT, UnsupportedStatement, open_pdf
+
+parser = statement_parser.default_parser
+transaction_store = None
+parse_cache = None
+fingerprint_index = None
+ingest_journal = None
+storage = None
+
+hash_indexes = {}
+query_engines = {}  # account (None for all of them) -> QueryEngine
+# Fold the ingest journal into the database once it holds this many uploads or bytes
+JOURNAL_COMPACT_RECORDS = 50
+JOURNAL_COMPACT_BYTES = 16 * 2**20
 
 
 def generate_file_hash(file_path):
-    hash_sha256 = hashlib.sha256()  
-    with open(file_path, "rb") as file:
-        while chunk := file.read(4096):  
-            hash_sha256.update(chunk)
-    return hash_sha256.hexdigest()
-
-def is_duplicate(file_path, storage_dir="uploaded_files"):
-    file_hash = generate_file_hash(file_path)
-    
-    if not os.path.exists(storage_dir):
-        os.makedirs(storage_dir)  
-    for stored_file in os.listdir(storage_dir):
-        stored_file_path = os.path.join(storage_dir, stored_file)
-        if generate_file_hash(stored_file_path) == file_hash:
-            return True 
-    return False
+    return hash_file(file_path)
+
+def get_hash_index(storage_dir="uploaded_files"):
+    if storage_dir not in hash_indexes:
+        hash_indexes[storage_dir] = HashIndex(storage_dir)
+    return hash_indexes[storage_dir]
+
+def is_duplicate(file_path, storage_dir="uploaded_files", file_hash=None):
+    if file_hash is None:
+        file_hash = generate_file_hash(file_path)
+    return get_hash_index(storage_dir).contains(file_hash)
+
+# ---------------- Streaming pipeline ----------------
+# pages -> statement lines -> transactions -> StatementSummary. Each stage is a
+# generator, so only one page of text is alive at a time. The parser is the
+# registered bank format detected from the PDF's metadata or first page, and
+# it appends rows straight to the summary's arrays.
+
+class UploadCancelled(Exception):
+    pass
+
+def check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise UploadCancelled()
+
+def iter_pages(pdf, bank_parser, cancel=None):
+    """Yield the text of the pages and regions bank_parser reads transactions from."""
+    from page_text import extract_page_text
+    for page in bank_parser.select_pages(pdf):
+        check_cancel(cancel)
+        text = extract_page_text(page, bank_parser.table_region(page))
+        # Release the layout objects pdfplumber cached for this page
+        page.close()
+        yield text
+
+def iter_statement_lines(pages, bank_parser=None):
+    is_statement_line = (bank_parser or parser).is_statement_line
+    for text in pages:
+        for line in text.split('\n'):
+            if is_statement_line(line):
+                yield line
+
+def timed_pages(pages, summary):
+    """Count pages and the time spent inside pdfplumber producing them."""
+    while True:
+        start = time.perf_counter()
+        text = next(pages, None)
+        if text is None:
+            return
+        summary.extract_seconds += time.perf_counter() - start
+        summary.page_count += 1
+        yield text
+
+def count_lines(lines, summary):
+    for line in lines:
+        summary.line_count += 1
+        yield line
+
+def iter_transactions(lines, bank_parser=None):
+    """Yield a Purchase, a Deposit or the statement year (int) for each line."""
+    parse_line = (bank_parser or parser).parse_line
+    for line in lines:
+        kind, date, amount, value = parse_line(line)
+        if kind == PURCHASE:
+            yield Purchase(date, value, amount)
+        elif kind == DEPOSIT:
+            yield Deposit(date, amount)
+        elif value is not None:
+            yield value
+
+def summarize_statement(pdf_path, cancel=None):
+    """Run the whole pipeline for one PDF. Needs no GUI and is picklable for worker processes.
+
+    Raises UnsupportedStatement for files no registered parser recognizes
+    and for statements without a year.
+    """
+    start = time.perf_counter()
+    summary = StatementSummary()
+    with open_pdf(pdf_path) as pdf:
+        bank_parser = statement_parser.detect_parser(pdf)
+        summary.parser_name = bank_parser.name
+        summary.parser_version = bank_parser.version
+        pages = timed_pages(iter_pages(pdf, bank_parser, cancel), summary)
+        lines = count_lines(iter_statement_lines(pages, bank_parser), summary)
+        bank_parser.parse_into(lines, summary)
+    summary.parse_seconds = time.perf_counter() - start - summary.extract_seconds
+    return check_dates(summary, pdf_path)
+
+def check_dates(summary, file_path):
+    """summary without the rows that can't be given a date.
+
+    Raises UnsupportedStatement for a statement with transactions but no
+    year: the year comes from the "Fee period" line, and without it the rows
+    would be filed under year 0. Rows with a month above 12 are lines the
+    parser misread and are dropped. Fingerprints, the transaction store and
+    the journal all turn rows into dates, so this runs before any of them.
+    """
+    if len(summary) and not MINYEAR <= summary.year <= MAXYEAR:
+        raise UnsupportedStatement("No statement year found")
+    summary, dropped = summary.dated_rows()
+    if dropped:
+        print(f"Skipping {dropped} lines with an impossible date in {file_path}")
+    return summary
 
 def extract_text_from_pdf(pdf_path):
-    lines_with_dates = []
-    with pdfplumber.open(pdf_path) as pdf:
-        date_pattern = r'^\d{1,2}/\d{1,2}'
-        year_pattern = r'\d{2}/\d{2}/\d{4}'
-        for page in pdf.pages:
-            text = page.extract_text()
-            lines = text.split('\n')
-            lines_with_dates.extend([line for line in lines if re.match(date_pattern, line) or re.search(year_pattern, line)])
-    return lines_with_dates
+    with open_pdf(pdf_path) as pdf:
+        bank_parser = statement_parser.detect_parser(pdf)
+        return list(iter_statement_lines(iter_pages(pdf, bank_parser), bank_parser))
 
 def clean_label(label):
     """Clean the purchase label to extract only the company name."""
-
-    # Remove non-alphanumeric characters (except spaces)
-    cleaned_label = re.sub(r'[^a-zA-Z0-9\s]', '', label)
-
-    # Remove location information (e.g., "Starbucks 123 Main St")
-    cleaned_label = re.sub(r'\b\d{1,5}\b.*', '', cleaned_label)
-
-    # Remove extra spaces
-    cleaned_label = re.sub(r'\s+', ' ', cleaned_label).strip()
-
-    return cleaned_label
+    return statement_parser.clean_label(label)
 
 def extract_purchase(line):
-
-    date_pattern = r'\d{1,2}/\d{1,2}'
-    amount_pattern = r'\d+\.\d{2}'
-    label_pattern = r'authorized on ' + date_pattern + r' (.*?) ' + amount_pattern
-
-    date_match = re.match(date_pattern, line)
-    amount_match = re.search(amount_pattern, line)
-    label_match = re.search(label_pattern, line)
-
-    if date_match:
-        date = date_match.group(0)
-    else:
-        date = "00/00"
-    if amount_match:
-        amount = float(amount_match.group(0))
-    else:
-        amount = 0.0
-    if label_match:
-        label = label_match.group(1)
-    else:
-        label = "Zelle"
-        
-    label = clean_label(label)    
-    purchase = Purchase(date, label, float(amount))
-    return purchase
+    _, date, amount, label = parser.parse_purchase(line)
+    return Purchase(date, label, amount)
 
 def extract_deposit(line):
-    date_pattern = r'\d{1,2}/\d{1,2}'
-    amount_pattern = r'\d+\.\d{2}'
-
-    amount_match = re.search(amount_pattern, line)
-    date_match = re.match(date_pattern, line)
-
-    if amount_match:
-        amount = float(amount_match.group(0))
-    else:
-        amount = 0.0
-
-    if date_match:
-        date = date_match.group(0)
-    else:
-        date = "00/00"
-
-    deposit = Deposit(date, amount)
-    return deposit
+    _, date, amount, _ = parser.parse_deposit(line)
+    return Deposit(date, amount)
 
 def extract_year(line):
-    year_pattern = r'Fee period \d{2}/\d{2}/(\d{4})'
-    match = re.search(year_pattern, line)
-    if match:
-        return int(match.group(1))
-    return None
-        
-def data_exists():
-    file_path = "database.json"
-    
-    if not os.path.exists(file_path):
-        return False
-    
-    try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            return bool(data)  
-    except (json.JSONDecodeError, FileNotFoundError):
-        return False
-
-def upload_file(user_data, ask_user_callback):
-    print("Starting the upload process...")
-
-    # Step 1: File selection
-    file_path = filedialog.askopenfilename(
-        title="Select a PDF File",
-        filetypes=[("PDF Files", "*.pdf"), ("All Files", "*.*")]
-    )
-    if not file_path:
-        print("No file selected.")
-        return
+    return parser.parse_year(line)[3]
+
+def process_lines(lines):
+    purchases = []
+    deposits = []
+    year = 0
+
+    for item in iter_transactions(lines):
+        if isinstance(item, Purchase):
+            purchases.append(item)
+        elif isinstance(item, Deposit):
+            deposits.append(item)
+        else:
+            year = item
 
-    print(f"File selected: {file_path}")
+    return purchases, deposits, year
 
-    # Step 2: Check for duplicates
-    if is_duplicate(file_path):
-        print("File already uploaded. Duplicate detected.")
-        return
-    print("File is not a duplicate. Proceeding with processing...")
+def collect_pdf_paths(paths):
+    """Expand files and directories into a sorted list of PDF paths."""
+    if isinstance(paths, str):
+        paths = [paths]
 
-    try:
-        # Step 3: Extract text from the PDF
-        text = extract_text_from_pdf(file_path)
-
-        purchases = []
-        deposits = []
-        year = 0
-
-        # Step 4: Process extracted text
-        for i, line in enumerate(text):
-            if "Purchase" in line or "Zelle to" in line or "Money Transfer" in line or "Withdraw" in line:
-                purchase = extract_purchase(line)
-                purchases.append(purchase)
-            elif "Fee period" in line:
-                year = extract_year(line)
-            else:
-                deposit = extract_deposit(line)
-                deposits.append(deposit)
-
-        # Step 5: Add data to user_data
-        user_data.add_data(purchases, deposits, year, ask_user_callback)
-
-        # Step 6: Save data to database.json
-        with open("database.json", "w") as file:
-            json.dump(user_data.save_data(), file, indent=4)
-
-        # Step 7: Copy the uploaded file to the storage directory
-        filename = os.path.basename(file_path)
-        shutil.copy(file_path, os.path.join("uploaded_files", filename))
-
-        # Final confirmation
-        if text:
-            print("Data found and uploaded successfully.")
+    pdf_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                pdf_paths.extend(os.path.join(root, name) for name in filenames if name.lower().endswith(".pdf"))
         else:
-            print("No lines with dates found in the uploaded file.")
-
-    except Exception as e:
-        print(f"An error occurred during the upload process: {e}")
-
+            pdf_paths.append(path)
+    return sorted(pdf_paths)
+
+def summarize_statements(file_paths, workers=None, progress=None, cancel=None):
+    """Run the pipeline for every statement, one pdfplumber pass per process.
+
+    Results are returned in the same order as file_paths regardless of which
+    worker finishes first, with None for files of an unsupported format.
+    """
+    progress = progress or print_progress
+    if workers == 1 or len(file_paths) <= 1:
+        summaries = []
+        for file_path in file_paths:
+            progress("Parsing statements", len(summaries), len(file_paths))
+            try:
+                summaries.append(summarize_statement(file_path, cancel))
+            except UnsupportedStatement as e:
+                print(f"Skipping unsupported file {file_path}: {e}")
+                summaries.append(None)
+        return summaries
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Uploads start the pool from a worker thread of the Tk process, and forking
+    # a process with threads and a display connection is unsafe
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    summaries = []
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+    try:
+        futures = [executor.submit(summarize_statement, file_path) for file_path in file_paths]
+        for file_path, future in zip(file_paths, futures):
+            try:
+                summaries.append(future.result())
+            except UnsupportedStatement as e:
+                print(f"Skipping unsupported file {file_path}: {e}")
+                summaries.append(None)
+            progress("Parsing statements", len(summaries), len(file_paths))
+            check_cancel(cancel)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return summaries
+
+def summarize_cached(file_paths, file_hashes, workers=None, progress=None, cancel=None):
+    """summarize_statements, but statements found in the parse cache skip pdfplumber."""
+    cache = get_parse_cache()
+    summaries = [cache.get(file_hash) for file_hash in file_hashes]
+    for i, summary in enumerate(summaries):
+        if summary is not None and not summary.has_valid_dates():
+            # Cached before such rows were rejected; parsing it again drops them
+            summaries[i] = None
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    metrics.current.count("parse_cache_hits", len(summaries) - len(missing))
+
+    parsed = summarize_statements([file_paths[i] for i in missing], workers, progress, cancel)
+    for i, summary in zip(missing, parsed):
+        summaries[i] = summary
+        if summary is not None:
+            cache.put(file_hashes[i], summary)
+    if missing:
+        cache.evict()
+    return summaries
+
+def print_progress(stage, done, total):
+    print(f"{stage}... ({done}/{total})")
+
+def save_database(user_data, full=False):
+    get_storage().save(user_data, full)
+
+def same_month_totals(year_data, other):
+    return all(month.spent_cents == other_month.spent_cents and month.earned_cents == other_month.earned_cents
+               for month, other_month in zip(year_data.months, other.months))
+
+def rebuild_aggregates(user_data):
+    """Recompute the totals from the transaction store's raw rows; returns how many account-years changed.
+
+    History imported before the store existed only has totals, so an
+    account-year is only replaced when its raw rows add up to the saved
+    totals month for month (only the category split can differ), or when
+    there are no saved totals for it. The others are kept as they are.
+    """
+    user_data.load_all()
+    partitions = {(year_data.account, year_data.year): year_data for year_data in user_data.years}
+    replaced = 0
+    for year_data in get_transaction_store().rebuild_years():
+        key = (year_data.account, year_data.year)
+        if key in partitions and not same_month_totals(partitions[key], year_data):
+            print(f"Kept the saved totals of {year_data.account} {year_data.year}: "
+                  f"the stored transactions do not cover all of them.")
+            continue
+        partitions[key] = year_data
+        replaced += 1
+    user_data.years = list(partitions.values())
+    save_database(user_data, full=True)
+    return replaced
+
+def rebuild_from_archive(user_data, ask_user_callback, workers=None, progress=None):
+    """Recompute every aggregate from the archived statements; returns how many were used.
+
+    Statements come from the parse cache where possible, so after a merchant
+    mapping change this mostly costs categorizing and summing. The raw rows
+    in the transaction store get the same categories, so range queries and
+    analytics agree with the totals.
+    """
+    progress = progress or print_progress
+    index = get_hash_index()
+    index.load()
+    file_hashes = sorted(index.entries)
+    file_paths = [os.path.join(index.storage_dir, index.entries[file_hash]["filename"]) for file_hash in file_hashes]
+
+    # Step 1: Summaries of every archived statement, parsing only cache misses,
+    # with rows repeated by overlapping statements counted once
+    from fingerprints import FingerprintIndex, drop_seen_rows
+    store = get_transaction_store()
+    summaries = []
+    for file_hash, summary in zip(file_hashes, summarize_cached(file_paths, file_hashes, workers, progress)):
+        if summary is not None:
+            summary.account = store.source_account(file_hash)
+            summaries.append(summary)
+    summaries, _, skipped = drop_seen_rows(summaries, FingerprintIndex(None))
+    if skipped:
+        print(f"Counted {skipped} transactions repeated across statements once.")
+
+    # Step 2: Categorize with the current merchant map
+    progress("Categorizing merchants", 0, 1)
+    labels = sorted(set().union(*(summary.labels() for summary in summaries)))
+    label_categories = resolve_categories(labels, ask_user_callback)
+
+    # Step 3: Replace the years with fresh totals and save everything
+    user_data.years = []
+    for summary in summaries:
+        user_data.apply_delta(summary.to_delta(label_categories))
+    save_database(user_data, full=True)
+    save_categories()
+
+    # Step 4: Recategorize the raw rows the same way. Merchants only in the store
+    # (e.g. from statements that are no longer archived) use the merchant map alone
+    merchant_categories = dict(label_categories)
+    others = [merchant for merchant in store.merchants if merchant not in merchant_categories]
+    merchant_categories.update(get_categorizer().match_many(others))
+    changed = store.recategorize(merchant_categories)
+    if changed:
+        print(f"Recategorized {changed} stored transactions.")
+        # The running sums were built from the old categories
+        query_engines.clear()
+    progress("Done", len(summaries), len(summaries))
+    return len(summaries)
+
+def get_transaction_store():
+    # NumPy is only needed once transactions are written or rebuilt
+    global transaction_store
+    if transaction_store is None:
+        from transaction_store import TransactionStore
+        transaction_store = TransactionStore()
+    return transaction_store
+
+def get_parse_cache():
+    global parse_cache
+    if parse_cache is None:
+        from parse_cache import ParseCache
+        parse_cache = ParseCache()
+    return parse_cache
+
+def get_fingerprint_index():
+    global fingerprint_index
+    if fingerprint_index is None:
+        from fingerprints import FingerprintIndex
+        fingerprint_index = FingerprintIndex()
+        store = get_transaction_store()
+        if not fingerprint_index.exists() and len(store):
+            # History imported before the index existed
+            fingerprint_index.build_from_store(store)
+            fingerprint_index.save()
+    return fingerprint_index
+
+def get_query_engine(account=None):
+    """Range totals over the raw rows of account, or of every account if it is None."""
+    if account not in query_engines:
+        from queries import QueryEngine
+        query_engines[account] = QueryEngine(get_transaction_store(), account)
+    query_engine = query_engines[account]
+    query_engine.refresh()
+    return query_engine
+
+def get_spending_matrix(user_data, account=DEFAULT_ACCOUNT, weekly=False):
+    """(period x category) spending of account for analytics.
+
+    Only the partitions already loaded are used, so callers that want
+    every year call user_data.load_all() first. The raw rows of the
+    transaction store are used when they match those totals month for month
+    (history imported before the store existed only has totals), and the
+    monthly totals otherwise. Weekly periods need the raw rows. Both are
+    cached until the data changes.
+    """
+    import analytics
+
+    store = get_transaction_store()
+    if weekly:
+        return analytics.store_matrix(store, account, weekly=True)
+    year_list = [year_data for year_data in user_data.years if year_data.account == account]
+    from_totals = analytics.years_matrix(year_list)
+    if len(store):
+        from_rows = analytics.store_matrix(store, account)
+        if from_rows.covers(from_totals):
+            return from_rows
+    return from_totals
+
+def get_ingest_journal():
+    global ingest_journal
+    if ingest_journal is None:
+        from journal import IngestJournal
+        ingest_journal = IngestJournal()
+    return ingest_journal
+
+def load_user_data():
+    """The last database snapshot plus every upload journaled since."""
+    user_data = AllData()
+    if data_exists():
+        get_storage().load(user_data)
+    recover_journal(user_data)
+    return user_data
+
+def recover_journal(user_data):
+    """Apply the uploads in the journal that the snapshot doesn't include yet; returns how many.
+
+    Each record is also checked against the stores written after the
+    journal during an upload (raw rows, fingerprints, merchant map,
+    archive), since the process may have stopped before reaching them.
+    Replaying the same journal onto the same snapshot always gives the same
+    totals.
+    """
+    records = get_ingest_journal().read()
+    if not records:
+        return 0
+
+    import numpy as np
+    from journal import entry_summary
+    store = get_transaction_store()
+    fingerprints = get_fingerprint_index()
+    categorizer = get_categorizer()
+    index = get_hash_index()
+    applied = 0
+    for record in records:
+        label_categories = record["categories"]
+        for label, category in label_categories.items():
+            if category != UNREVIEWED_CATEGORY and categorizer.match(label) is None:
+                categorizer.add_merchant(label, category)
+
+        for entry in record["statements"]:
+            summary = entry_summary(entry)
+            if not summary.has_valid_dates():
+                print(f"Skipping statement {entry['hash'][:12]} in the ingest journal: its rows have no valid date.")
+                continue
+            if not store.has_source(entry["hash"]):
+                store.append_summary(summary, label_categories, entry["hash"])
+            fingerprints.add_many(np.array([int(value, 16) for value in entry["fingerprints"]], dtype=np.uint64))
+            if not index.contains(entry["hash"]):
+                print(f"Statement {entry['hash'][:12]} was imported but not archived; upload it again to archive it.")
+            if record["seq"] > user_data.journal_seq:
+                user_data.apply_delta(summary.to_delta(label_categories))
+
+        if record["seq"] > user_data.journal_seq:
+            user_data.journal_seq = record["seq"]
+            applied += 1
+
+    store.flush()
+    save_categories()
+    if applied:
+        print(f"Recovered {applied} uploads from the ingest journal.")
+    return applied
+
+def compact_journal(user_data, force=False):
+    """Save the totals and fingerprints as a new snapshot and empty the journal.
+
+    Without force this only happens once the journal has reached
+    JOURNAL_COMPACT_RECORDS uploads or JOURNAL_COMPACT_BYTES.
+    """
+    journal = get_ingest_journal()
+    if not journal.loaded:
+        journal.read()
+    if not journal.count or not (force or journal.count >= JOURNAL_COMPACT_RECORDS
+                                 or journal.size >= JOURNAL_COMPACT_BYTES):
+        return False
+    storage = get_storage()
+    storage.save(user_data)
+    storage.sync()
+    get_fingerprint_index().save()
+    journal.clear(user_data.journal_seq)
+    return True
+
+def get_storage():
+    global storage
+    if storage is None:
+        storage = open_storage()
+    return storage
 
+def data_exists():
+    return get_storage().exists()
+
+def reset_state():
+    """Forget the lazily loaded globals so the next call reads the files in the current directory.
+
+    Used by the tests and benchmarks, which switch between data directories.
+    """
+    global storage, transaction_store, parse_cache, fingerprint_index, ingest_journal
+    import objects
+    objects.category_data = None
+    objects.categorizer = None
+    storage = None
+    transaction_store = None
+    query_engines.clear()
+    parse_cache = None
+    fingerprint_index = None
+    ingest_journal = None
+    hash_indexes.clear()
+
+def import_files(user_data, paths, ask_user_callback, workers=None, progress=None, cancel=None, apply=None,
+                 stats=None, account=DEFAULT_ACCOUNT):
+    """Import statements from files and directories into account; returns how many were imported.
+
+    progress(stage, done, total) is called as work advances and cancel (a
+    threading.Event) is checked between steps until the data is applied.
+    apply(fn) runs fn where user_data may be changed, e.g. on the GUI thread
+    when the import itself runs on a worker thread. If stats is a dict, the
+    file, line and transaction counts are added to it.
+    """
+    progress = progress or print_progress
+    apply = apply or (lambda fn: fn())
+    stats = stats if stats is not None else {}
+    for key in ("files", "duplicates", "unsupported", "skipped_rows", "lines", "transactions"):
+        stats.setdefault(key, 0)
+
+    with metrics.upload() as upload_metrics:
+        # Step 1: Expand directories and skip anything already uploaded
+        file_paths = []
+        file_hashes = []
+        seen = set()
+        with upload_metrics.span("hash"):
+            candidates = collect_pdf_paths(paths)
+            for i, file_path in enumerate(candidates):
+                progress("Checking for duplicates", i, len(candidates))
+                check_cancel(cancel)
+                file_hash = generate_file_hash(file_path)
+                if file_hash in seen or is_duplicate(file_path, file_hash=file_hash):
+                    print(f"Skipping duplicate: {file_path}")
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(file_hash)
+                file_paths.append(file_path)
+                file_hashes.append(file_hash)
+        upload_metrics.count("duplicates", stats["duplicates"])
+
+        if not file_paths:
+            print("No new files to upload.")
+            return 0
+
+        # Step 2: Extract and parse every PDF, in parallel for batches
+        with upload_metrics.span("parse"):
+            summaries = summarize_cached(file_paths, file_hashes, workers, progress, cancel)
+        supported = [i for i, summary in enumerate(summaries) if summary is not None]
+        stats["unsupported"] += len(summaries) - len(supported)
+        upload_metrics.count("unsupported", len(summaries) - len(supported))
+        file_paths = [file_paths[i] for i in supported]
+        file_hashes = [file_hashes[i] for i in supported]
+        summaries = [summaries[i] for i in supported]
+        for summary in summaries:
+            summary.account = account
+        if not file_paths:
+            print("No supported statements to upload.")
+            return 0
+
+        # Drop rows already imported, e.g. from a re-issued or overlapping statement
+        from fingerprints import drop_seen_rows
+        with upload_metrics.span("dedup"):
+            fingerprints = get_fingerprint_index()
+            summaries, new_fingerprints, skipped = drop_seen_rows(summaries, fingerprints)
+        stats["skipped_rows"] += skipped
+        upload_metrics.count("skipped_rows", skipped)
+        if skipped:
+            print(f"Skipped {skipped} transactions that were already imported.")
+
+        # Step 3: Categorize every distinct merchant of the upload in one step
+        progress("Categorizing merchants", 0, 1)
+        labels = sorted(set().union(*(summary.labels() for summary in summaries)))
+
+        def ask_user(label, categories):
+            upload_metrics.count("questions")
+            with upload_metrics.span("ask_user"):
+                return ask_user_callback(label, categories)
+
+        with upload_metrics.span("categorize"):
+            categorizer = get_categorizer()
+            hits, misses, fuzzy_calls = categorizer.hits, categorizer.misses, categorizer.fuzzy_calls
+            label_categories = resolve_categories(labels, ask_user)
+        check_cancel(cancel)
+
+        # Step 4: Commit the upload to the journal. Once the record is on disk the
+        # upload has landed; everything after it is redone on startup if needed
+        from journal import statement_entry
+        with upload_metrics.span("journal"):
+            entries = []
+            start = 0
+            for summary, file_hash in zip(summaries, file_hashes):
+                # new_fingerprints holds the kept rows of every summary, in order
+                entries.append(statement_entry(summary, file_hash, new_fingerprints[start:start + len(summary)]))
+                start += len(summary)
+            seq = get_ingest_journal().append({
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "statements": entries,
+                "categories": label_categories,
+            }, user_data.journal_seq)
+
+        # Step 5: Add data to user_data in path order so totals match a serial import
+        deltas = [summary.to_delta(label_categories) for summary in summaries]
+
+        def apply_deltas():
+            with upload_metrics.span("apply"):
+                for delta in deltas:
+                    user_data.apply_delta(delta)
+                user_data.journal_seq = seq
+        apply(apply_deltas)
+
+        # Step 6: Save the raw rows and new merchants. The totals and fingerprints
+        # reach the database when the journal is compacted. The store and the
+        # query engine are read by whoever reads user_data, so they change there too
+        progress("Saving", 0, 1)
+
+        def save_rows():
+            with upload_metrics.span("save"):
+                store = get_transaction_store()
+                for file_hash, summary in zip(file_hashes, summaries):
+                    store.append_summary(summary, label_categories, file_hash)
+                with upload_metrics.span("save_transactions"):
+                    store.flush()
+                fingerprints.add_many(new_fingerprints)
+            for query_engine in query_engines.values():
+                query_engine.refresh()
+        apply(save_rows)
+        with upload_metrics.span("save_categories"):
+            save_categories()
+
+        # Step 7: Copy the uploaded files to the storage directory, named by their hash,
+        # writing the index once for the batch
+        index = get_hash_index()
+        with upload_metrics.span("archive"):
+            try:
+                for i, (file_path, file_hash) in enumerate(zip(file_paths, file_hashes)):
+                    progress("Archiving statements", i, len(file_paths))
+                    index.add(file_path, file_hash, save=False)
+            finally:
+                index.save()
+
+        # Compaction reads user_data and writes the database, so it runs where user_data is changed
+        def compact():
+            with upload_metrics.span("compact"):
+                compact_journal(user_data)
+        apply(compact)
+
+        stats["files"] += len(file_paths)
+        stats["lines"] += sum(summary.line_count for summary in summaries)
+        stats["transactions"] += sum(summary.transaction_count for summary in summaries)
+        if upload_metrics.enabled:
+            count_upload(upload_metrics, summaries, labels, categorizer, hits, misses, fuzzy_calls)
+
+        progress("Done", len(file_paths), len(file_paths))
+        if not any(summary.transaction_count for summary in summaries):
+            print("No lines with dates found in the uploaded files.")
+        return len(file_paths)
+
+def count_upload(upload_metrics, summaries, labels, categorizer, hits, misses, fuzzy_calls):
+    upload_metrics.count("files", len(summaries))
+    upload_metrics.count("pages", sum(summary.page_count for summary in summaries))
+    upload_metrics.count("lines", sum(summary.line_count for summary in summaries))
+    upload_metrics.count("transactions", sum(summary.transaction_count for summary in summaries))
+    upload_metrics.count("merchants", len(labels))
+    upload_metrics.count("cache_hits", categorizer.hits - hits)
+    upload_metrics.count("cache_misses", categorizer.misses - misses)
+    upload_metrics.count("fuzzy_calls", categorizer.fuzzy_calls - fuzzy_calls)
+    # Summed over statements, so with worker processes these are CPU seconds
+    upload_metrics.add_time("pdfplumber", sum(summary.extract_seconds for summary in summaries))
+    upload_metrics.add_time("regex_parse", sum(summary.parse_seconds for summary in summaries))
@@ -0,0 +1,109 @@
+"""Extraction regression check: the upload pipeline against full-page pdfplumber text.
+
+    python benchmarks/extraction.py [PATH ...] [--statements N] [--disclosures N] [--output FILE]
+
+Every PDF is parsed twice: once from pdfplumber's extract_text of every
+page, and once through summarize_statement, which probes pages, crops them
+to the parser's table region and extracts text from the character tuples.
+The parsed transactions must be identical. PATHs are PDFs or directories
+of them, e.g. a folder of real statements; without any, a synthetic corpus
+with disclosure pages is generated in a temporary directory. Prints the
+timings as JSON and exits with status 1 on any mismatch.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+
+
+def rows(summary):
+    labels = summary.label_list()
+    return summary.year, [(month, day, cents, labels[label_id] if label_id >= 0 else None)
+                          for month, day, cents, label_id in zip(summary.row_months, summary.row_days,
+                                                                 summary.row_cents, summary.row_labels)]
+
+
+def reference_summary(path):
+    """Parse path the way uploads did before page probing: extract_text on every page."""
+    import statement_parser
+    from backend import iter_statement_lines, open_pdf
+    from objects import StatementSummary
+
+    summary = StatementSummary()
+    with open_pdf(path) as pdf:
+        bank_parser = statement_parser.detect_parser(pdf)
+        texts = []
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()
+            summary.page_count += 1
+        bank_parser.parse_into(iter_statement_lines(texts, bank_parser), summary)
+    return summary
+
+
+def check(paths):
+    from backend import summarize_statement
+
+    results = {"statements": 0, "pages": 0, "pages_extracted": 0, "transactions": 0,
+               "reference_seconds": 0.0, "pipeline_seconds": 0.0, "mismatches": []}
+    for path in paths:
+        start = time.perf_counter()
+        reference = reference_summary(path)
+        results["reference_seconds"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = summarize_statement(path)
+        results["pipeline_seconds"] += time.perf_counter() - start
+
+        results["statements"] += 1
+        results["pages"] += reference.page_count
+        results["pages_extracted"] += summary.page_count
+        results["transactions"] += len(reference)
+        if rows(summary) != rows(reference):
+            results["mismatches"].append(path)
+
+    pages = max(results["pages"], 1)
+    results["reference_ms_per_page"] = round(results["reference_seconds"] * 1000 / pages, 2)
+    results["pipeline_ms_per_page"] = round(results["pipeline_seconds"] * 1000 / pages, 2)
+    results["speedup"] = round(results["reference_seconds"] / max(results["pipeline_seconds"], 1e-9), 2)
+    results["reference_seconds"] = round(results["reference_seconds"], 4)
+    results["pipeline_seconds"] = round(results["pipeline_seconds"], 4)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="statement PDFs or directories of them")
+    parser.add_argument("--statements", type=int, default=12, help="synthetic statements when no paths are given")
+    parser.add_argument("--pages", type=int, default=2, help="transaction pages per synthetic statement")
+    parser.add_argument("--disclosures", type=int, default=2, help="pages without transactions per synthetic statement")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from backend import collect_pdf_paths
+
+    with tempfile.TemporaryDirectory() as corpus:
+        if args.paths:
+            paths = collect_pdf_paths(args.paths)
+        else:
+            paths = synthetic.generate(corpus, args.statements, args.pages, years=[2023, 2024],
+                                       disclosures=args.disclosures)
+        results = check(paths)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 1 if results["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
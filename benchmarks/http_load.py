@@ -0,0 +1,182 @@
+"""Load test for api_server.py: requests per second and latency percentiles.
+
+    python benchmarks/http_load.py [--statements N] [--connections N] [--requests N]
+        [--revalidate FRACTION] [--output results.json]
+
+Generates synthetic statements in a temporary directory, starts api_server.py
+there on a free port in its own process and uploads the statements through
+POST /upload. Then --connections keep-alive clients send --requests GETs in
+total, spread over the year, month and category endpoints, with
+--revalidate of them carrying the ETag from an earlier response so the
+server can answer 304. Prints the results as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+
+YEARS = [2023, 2024]
+ACCOUNTS = ["", "visa"]
+
+
+def start_server(work_dir):
+    """Start api_server.py in work_dir; returns (process, port)."""
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "api_server.py"), "--port", "0"],
+                               cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if line.startswith("Serving on "):
+            # Keep reading what the server prints so it never blocks on a full pipe
+            threading.Thread(target=process.stdout.read, daemon=True).start()
+            return process, int(line.rsplit(":", 1)[1])
+    raise RuntimeError("api_server.py exited before it started serving")
+
+
+async def request(reader, writer, method, target, headers=None, body=b""):
+    """Send one request on an open connection; returns (status, headers, body)."""
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    response_body = await reader.readexactly(int(response_headers.get("content-length", 0)))
+    return status, response_headers, response_body
+
+
+def targets():
+    paths = ["/accounts"]
+    for account in ACCOUNTS:
+        suffix = f"account={account}"
+        paths.append(f"/years?{suffix}")
+        paths.append(f"/categories?{suffix}")
+        for year in YEARS:
+            paths.append(f"/years/{year}?{suffix}")
+            paths.append(f"/categories?year={year}&{suffix}")
+            for month in range(1, 13):
+                paths.append(f"/years/{year}/months/{month}?{suffix}")
+                paths.append(f"/categories?year={year}&month={month}&{suffix}")
+    return paths
+
+
+async def upload(port, paths):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    start = time.perf_counter()
+    transactions = 0
+    for i, path in enumerate(paths):
+        # Statements go through the months in order, so every account gets some of each year
+        account = ACCOUNTS[i % len(ACCOUNTS)]
+        with open(path, "rb") as file:
+            status, _, body = await request(reader, writer, "POST", f"/upload?account={account}", body=file.read())
+        if status != 200:
+            raise RuntimeError(f"upload of {path} failed with {status}: {body.decode()}")
+        transactions += json.loads(body)["transactions"]
+    seconds = time.perf_counter() - start
+    writer.close()
+    return {"statements": len(paths), "transactions": transactions, "seconds": round(seconds, 4)}
+
+
+async def client(port, count, revalidate, rng, latencies, statuses, etags):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    paths = targets()
+    for _ in range(count):
+        target = rng.choice(paths)
+        headers = {}
+        if target in etags and rng.random() < revalidate:
+            headers["If-None-Match"] = etags[target]
+        start = time.perf_counter()
+        status, response_headers, _ = await request(reader, writer, "GET", target, headers)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if "etag" in response_headers:
+            etags[target] = response_headers["etag"]
+    writer.close()
+
+
+async def load(port, connections, requests, revalidate, seed):
+    latencies = []
+    statuses = {}
+    etags = {}
+    rng = random.Random(seed)
+    per_client = [requests // connections + (i < requests % connections) for i in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, count, revalidate, random.Random(rng.random()), latencies, statuses, etags)
+                           for count in per_client))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def run(port, statement_paths, args):
+    results = {"upload": await upload(port, statement_paths)}
+    results["load"] = await load(port, args.connections, args.requests, args.revalidate, args.seed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--statements", type=int, default=12 * len(YEARS),
+                        help="synthetic statements to upload first, a month each")
+    parser.add_argument("--pages", type=int, default=1, help="pages per synthetic statement")
+    parser.add_argument("--connections", type=int, default=16, help="concurrent keep-alive clients")
+    parser.add_argument("--requests", type=int, default=20_000, help="GET requests over all clients")
+    parser.add_argument("--revalidate", type=float, default=0.5,
+                        help="fraction of repeat requests that send If-None-Match")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        statement_paths = synthetic.generate(os.path.join(work_dir, "statements"), args.statements, args.pages,
+                                             years=YEARS)
+        # The server reads categories.json from its working directory
+        os.replace(os.path.join(work_dir, "statements", "categories.json"), os.path.join(work_dir, "categories.json"))
+        process, port = start_server(work_dir)
+        try:
+            results = asyncio.run(run(port, statement_paths, args))
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
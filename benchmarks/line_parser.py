@@ -0,0 +1,172 @@
+"""Line parser regression check and throughput: parse_line/parse_record against the original extract_* path.
+
+    python benchmarks/line_parser.py [--lines N] [--repeat N] [--output FILE]
+
+The reference below is the statement loop and extract_* functions uploads
+used before the compiled parser, kept verbatim: keyword checks with `in`,
+then re.match/re.search with the pattern strings built on every call.
+Every synthetic line plus EDGE_LINES goes through both, the results must
+be identical, and each path is timed in lines per second. Prints the
+results as JSON and exits with status 1 on any mismatch.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+
+# Lines the synthetic statements don't produce
+EDGE_LINES = [
+    "3/14 Purchase authorized on 03/13 Corner Store -12.50",
+    "3/14 Purchase authorized on 03/13 Hardware Depot 1,234.56 5,000.00",
+    "3/14 Purchase authorized on 03/13 4.99",
+    "3/14 Purchase authorized on 03/13  Double  Space  Cafe 7.25",
+    "3/14 Zelle to Smith on 03/14 Ref # Pp0 25.00",
+    "3/14 Zelle to 19.99",
+    "3/14 Recurring Payment Withdrawal 80.00",
+    "3/14 Purchase Return authorized on 03/12 Shoe Outlet 45.00",
+    "3/14 Purchase with no amount at all",
+    "12/31 Online Transfer From Savings -1,500.00 2,750.10",
+    "12/31 Interest Payment 0.07",
+    "12/31 Deposit without an amount",
+    "12/31",
+    "Statement period 01/01/2024 to 01/31/2024 1,024.00",
+    "Fee period 02/01/2024 - 02/29/2024",
+    "Fee period 02/01/2024 - 02/29/2024 Purchase authorized on 02/03 Odd Line 3.00",
+    "Fee period 2/1/2024 - 2/29/2024",
+    "01/05 Fee period summary 15.00",
+]
+
+
+# ---------------- Original path ----------------
+def reference_clean_label(label):
+    cleaned_label = re.sub(r'[^a-zA-Z0-9\s]', '', label)
+    cleaned_label = re.sub(r'\b\d{1,5}\b.*', '', cleaned_label)
+    cleaned_label = re.sub(r'\s+', ' ', cleaned_label).strip()
+    return cleaned_label
+
+
+def reference_purchase(line):
+    date_pattern = r'\d{1,2}/\d{1,2}'
+    amount_pattern = r'\d+\.\d{2}'
+    label_pattern = r'authorized on ' + date_pattern + r' (.*?) ' + amount_pattern
+
+    date_match = re.match(date_pattern, line)
+    amount_match = re.search(amount_pattern, line)
+    label_match = re.search(label_pattern, line)
+
+    date = date_match.group(0) if date_match else "00/00"
+    amount = float(amount_match.group(0)) if amount_match else 0.0
+    label = label_match.group(1) if label_match else "Zelle"
+    return ("purchase", date, amount, reference_clean_label(label))
+
+
+def reference_deposit(line):
+    date_pattern = r'\d{1,2}/\d{1,2}'
+    amount_pattern = r'\d+\.\d{2}'
+
+    amount_match = re.search(amount_pattern, line)
+    date_match = re.match(date_pattern, line)
+
+    amount = float(amount_match.group(0)) if amount_match else 0.0
+    date = date_match.group(0) if date_match else "00/00"
+    return ("deposit", date, amount, None)
+
+
+def reference_year(line):
+    year_pattern = r'Fee period \d{2}/\d{2}/(\d{4})'
+    match = re.search(year_pattern, line)
+    return ("year", None, None, int(match.group(1)) if match else None)
+
+
+def reference_line(line):
+    """(kind, date, amount, label or year) the way the original upload loop read line."""
+    if "Purchase" in line or "Zelle to" in line or "Money Transfer" in line or "Withdraw" in line:
+        return reference_purchase(line)
+    elif "Fee period" in line:
+        return reference_year(line)
+    return reference_deposit(line)
+
+
+def reference_record(line):
+    """reference_line as the integer row the Purchase and Deposit objects kept."""
+    from objects import parse_date, to_cents
+    kind, date, amount, value = reference_line(line)
+    if kind == "year":
+        return (kind, 0, 0, 0, value)
+    month, day = parse_date(date)
+    return (kind, month, day, to_cents(amount), value)
+
+
+# ---------------- Check and timing ----------------
+def statement_lines(count, seed=0):
+    """count synthetic statement lines, fee period lines included, plus EDGE_LINES."""
+    rng = random.Random(seed)
+    merchants = synthetic.make_merchants(500, rng)
+    lines = []
+    for statement in synthetic.iter_statements(count // synthetic.LINES_PER_PAGE + 1, merchants, [2023, 2024],
+                                               pages=1, seed=seed):
+        lines.extend(statement)
+    return lines[:count] + EDGE_LINES
+
+
+def mismatches(lines):
+    """Lines whose parse_line or parse_record output differs from the original path."""
+    import statement_parser
+    parser = statement_parser.default_parser
+    return [line for line in lines
+            if parser.parse_line(line) != reference_line(line) or parser.parse_record(line) != reference_record(line)]
+
+
+def lines_per_second(parse, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(lines)
+        best = min(best, time.perf_counter() - start)
+    return round(len(lines) / best)
+
+
+def run(count, repeat):
+    import statement_parser
+    parser = statement_parser.default_parser
+    lines = statement_lines(count)
+    statement_parser.clean_label.cache_clear()
+    results = {
+        "lines": len(lines),
+        "mismatches": mismatches(lines),
+        "reference_lines_per_second": lines_per_second(lambda batch: [reference_line(line) for line in batch],
+                                                       lines, repeat),
+        "parse_lines_per_second": lines_per_second(parser.parse_lines, lines, repeat),
+        "parse_record_lines_per_second": lines_per_second(lambda batch: [parser.parse_record(line) for line in batch],
+                                                          lines, repeat),
+    }
+    results["speedup"] = round(results["parse_record_lines_per_second"] / results["reference_lines_per_second"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="synthetic statement lines")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes per path; the fastest is kept")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.lines, args.repeat)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 1 if results["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""End-to-end benchmark suite: throughput and peak memory per stage.
+
+    python benchmarks/run.py [--tiers small medium large] [--pdf-limit N]
+        [--output results.json] [--compare baseline.json] [--no-memory]
+
+Each tier runs in a fresh process and a temporary directory, on statements
+and merchants from benchmarks/synthetic.py with a fixed seed. Every stage is
+run once for time and, unless --no-memory is given, once more under
+tracemalloc for its peak Python memory. The results are saved as JSON with
+the current commit so runs can be compared; --compare exits with status 1
+when a stage got slower than --tolerance allows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic
+
+TIERS = {
+    "small": {"statements": 1, "merchants": 100},
+    "medium": {"statements": 100, "merchants": 10_000},
+    "large": {"statements": 10_000, "merchants": 100_000},
+}
+# PDF extraction needs ~20 ms a page, so PDF stages only use the first statements
+PDF_LIMIT = 20
+SET_CATEGORY_SAMPLE = 200
+YEARS = [2022, 2023, 2024]
+
+
+def answer_other(label, categories):
+    return "Other"
+
+
+class Stages:
+    """The measured stages of one tier, in the order a real upload runs them."""
+
+    def __init__(self, lines_by_statement, pdf_paths):
+        self.lines_by_statement = lines_by_statement
+        self.pdf_paths = pdf_paths
+        self.purchases = []
+        self.deposits = {}
+        self.user_data = None
+
+    def extract_pdf(self):
+        from backend import extract_text_from_pdf
+        for path in self.pdf_paths:
+            extract_text_from_pdf(path)
+        return len(self.pdf_paths)
+
+    def parse_lines(self):
+        from backend import process_lines
+        self.purchases = []
+        self.deposits = {}
+        count = 0
+        for lines in self.lines_by_statement:
+            purchases, deposits, year = process_lines(lines)
+            self.purchases.append((year, purchases))
+            self.deposits.setdefault(year, []).extend(deposits)
+            count += len(lines)
+        return count
+
+    def categorize(self):
+        from objects import resolve_categories
+        labels = sorted({purchase.label for _, purchases in self.purchases for purchase in purchases})
+        resolve_categories(labels, answer_other)
+        return len(labels)
+
+    def set_category(self):
+        sample = [purchase for _, purchases in self.purchases for purchase in purchases][:SET_CATEGORY_SAMPLE]
+        for purchase in sample:
+            purchase.set_category(answer_other)
+        return len(sample)
+
+    def add_purchases(self):
+        from objects import AllData
+        self.user_data = AllData()
+        count = 0
+        for year, purchases in self.purchases:
+            self.user_data.get_year(year, create=True).add_purchases(purchases, answer_other)
+            count += len(purchases)
+        for year, deposits in self.deposits.items():
+            self.user_data.get_year(year, create=True).add_deposits(deposits)
+            count += len(deposits)
+        return count
+
+    def json_save(self):
+        from storage import JsonStorage
+        JsonStorage().save(self.user_data)
+        return len(self.user_data.years)
+
+    def json_load(self):
+        from objects import AllData
+        from storage import JsonStorage
+        JsonStorage().load(AllData())
+        return len(self.user_data.years)
+
+    def sqlite_save(self):
+        from storage import SqliteStorage
+        storage = SqliteStorage()
+        storage.save(self.user_data, full=True)
+        storage.close()
+        return len(self.user_data.years)
+
+    def is_duplicate(self):
+        # Runs after import_files, so every statement is found in the archive
+        from backend import is_duplicate
+        for path in self.pdf_paths:
+            is_duplicate(path)
+        return len(self.pdf_paths)
+
+    def import_files(self):
+        # Worker processes are not seen by tracemalloc, only the parent's share
+        from backend import import_files
+        from objects import AllData
+        import contextlib
+        stats = {}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            import_files(AllData(), self.pdf_paths, answer_other, progress=lambda *args: None, stats=stats)
+        # A pass that sees state left by the one before imports nothing and would look fast
+        expected = sum(len(lines) - 1 for lines in self.lines_by_statement[:len(self.pdf_paths)])
+        if stats["files"] != len(self.pdf_paths) or stats["transactions"] != expected:
+            raise RuntimeError(f"import_files imported {stats['files']} files and {stats['transactions']} "
+                               f"transactions, expected {len(self.pdf_paths)} and {expected}")
+        return len(self.pdf_paths)
+
+    ORDER = ["extract_pdf", "parse_lines", "categorize", "set_category", "add_purchases",
+             "json_save", "json_load", "sqlite_save", "import_files", "is_duplicate"]
+
+
+def run_pass(work_dir, data_dir, lines_by_statement, pdf_paths, memory):
+    """Run every stage once in a clean work_dir; returns {stage: (items, seconds, peak bytes)}."""
+    from backend import reset_state
+    os.makedirs(work_dir)
+    with open(os.path.join(data_dir, "categories.json"), "rb") as source, \
+            open(os.path.join(work_dir, "categories.json"), "wb") as target:
+        target.write(source.read())
+    os.chdir(work_dir)
+    reset_state()
+
+    stages = Stages(lines_by_statement, pdf_paths)
+    results = {}
+    for name in Stages.ORDER:
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        items = getattr(stages, name)()
+        seconds = time.perf_counter() - start
+        peak = 0
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[name] = (items, seconds, peak)
+    return results
+
+
+def run_tier(name, pdf_limit, memory):
+    tier = TIERS[name]
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as root:
+        data_dir = os.path.join(root, "data")
+        pdf_count = min(tier["statements"], pdf_limit)
+        pdf_paths = synthetic.generate(data_dir, pdf_count, merchant_count=tier["merchants"], years=YEARS)
+
+        # Same seed as generate(), so the text statements use the same merchants
+        merchants = synthetic.make_merchants(tier["merchants"], random.Random(0))
+        lines_by_statement = list(synthetic.iter_statements(tier["statements"], merchants, YEARS))
+
+        timed = run_pass(os.path.join(root, "timed"), data_dir, lines_by_statement, pdf_paths, memory=False)
+        traced = run_pass(os.path.join(root, "traced"), data_dir, lines_by_statement, pdf_paths, memory=True) \
+            if memory else {}
+        os.chdir(REPO_DIR)
+
+    stages = {}
+    for stage, (items, seconds, _) in timed.items():
+        stages[stage] = {
+            "items": items,
+            "seconds": round(seconds, 6),
+            "per_second": round(items / seconds, 2) if seconds else None,
+            "peak_mb": round(traced[stage][2] / 2**20, 3) if stage in traced else None,
+        }
+    return {"statements": tier["statements"], "pdf_statements": pdf_count, "merchants": tier["merchants"],
+            "stages": stages}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print per-stage throughput against baseline; returns the regressed stages."""
+    regressions = []
+    for tier, tier_results in results["tiers"].items():
+        old_tier = baseline.get("tiers", {}).get(tier)
+        if not old_tier:
+            continue
+        for stage, stats in tier_results["stages"].items():
+            old = old_tier["stages"].get(stage)
+            if not old or not old["per_second"] or not stats["per_second"]:
+                continue
+            ratio = stats["per_second"] / old["per_second"]
+            print(f"{tier:8} {stage:14} {ratio:6.2f}x", file=sys.stderr)
+            if ratio < 1 - tolerance:
+                regressions.append(f"{tier}/{stage}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["small", "medium"])
+    parser.add_argument("--pdf-limit", type=int, default=PDF_LIMIT, help="most statements written as PDFs per tier")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed throughput drop before failing")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--tier-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tier_worker:
+        print(json.dumps(run_tier(args.tier_worker, args.pdf_limit, not args.no_memory)))
+        return
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tiers": {},
+    }
+    for tier in args.tiers:
+        print(f"Running tier {tier}...", file=sys.stderr)
+        command = [sys.executable, os.path.abspath(__file__), "--tier-worker", tier, "--pdf-limit", str(args.pdf_limit)]
+        if args.no_memory:
+            command.append("--no-memory")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results["tiers"][tier] = json.loads(output.splitlines()[-1])
+
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"Slower than baseline: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Startup benchmark: import cost and time to first paint.
+
+Run from a directory holding categories.json (and optionally the database):
+
+    python benchmarks/startup.py [--data-dir DIR] [--runs N] [--output FILE]
+
+Import time comes from `python -X importtime -c "import backend, frontend"`.
+First paint runs app.py with FINANCE_TRACKER_STARTUP_BENCH set; it needs a
+display and is skipped without one. The script exits with status 1 when the
+median of a measurement misses its target.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGET_MS = 150
+FIRST_PAINT_TARGET_MS = 500
+# None of these should be imported before an upload or the charts need them
+DEFERRED_MODULES = ["matplotlib", "pdfplumber", "rapidfuzz", "numpy"]
+
+
+def measure_imports(data_dir):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend, frontend"],
+                            cwd=data_dir, env=env, capture_output=True, text=True, check=True)
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.rstrip(), int(self_us), int(cumulative_us)))
+
+    # Top-level imports are the ones with the shallowest indentation
+    top_level = [m for m in modules if not m[0].startswith("  ")]
+    loaded = {name.strip().split(".")[0] for name, _, _ in modules}
+    return {
+        "total_ms": sum(cumulative for _, _, cumulative in top_level) / 1000,
+        "slowest": [{"module": name.strip(), "self_ms": self_us / 1000}
+                    for name, self_us, _ in sorted(modules, key=lambda m: -m[1])[:10]],
+        "eagerly_loaded": [name for name in DEFERRED_MODULES if name in loaded],
+    }
+
+
+def measure_first_paint(data_dir):
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        return None
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, FINANCE_TRACKER_STARTUP_BENCH="1")
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "app.py")],
+                            cwd=data_dir, env=env, capture_output=True, text=True, timeout=60)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"app.py did not report startup times:\n{result.stdout}\n{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=os.getcwd())
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    imports = [measure_imports(args.data_dir) for _ in range(args.runs)]
+    paints = [measure_first_paint(args.data_dir) for _ in range(args.runs)]
+    paints = [paint for paint in paints if paint]
+
+    results = {
+        "import_ms": statistics.median(run["total_ms"] for run in imports),
+        "import_target_ms": IMPORT_TARGET_MS,
+        "slowest_imports": imports[-1]["slowest"],
+        "eagerly_loaded": imports[-1]["eagerly_loaded"],
+        "first_paint_ms": statistics.median(p["first_paint_ms"] for p in paints) if paints else None,
+        "charts_ms": statistics.median(p["charts_ms"] for p in paints) if paints else None,
+        "first_paint_target_ms": FIRST_PAINT_TARGET_MS,
+    }
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    failed = results["import_ms"] > IMPORT_TARGET_MS or results["eagerly_loaded"]
+    if results["first_paint_ms"] is not None:
+        failed = failed or results["first_paint_ms"] > FIRST_PAINT_TARGET_MS
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Synthetic Wells Fargo-style statements for benchmarks.
+
+    python benchmarks/synthetic.py OUTPUT_DIR [--statements N] [--pages N]
+        [--merchants N] [--years 2023 2024] [--disclosures N] [--text] [--seed N]
+
+Writes statement_00001.pdf ... (or .txt with --text, one statement line per
+line) and a categories.json that knows KNOWN_FRACTION of the merchants, so
+the rest go through fuzzy matching. --disclosures appends pages of legal
+text without transactions to each PDF. The same seed always gives the same
+files.
+"""
+import argparse
+import json
+import os
+import random
+
+CATEGORIES = ["Food", "Transportation", "Entertainment", "Shopping", "Bills", "Other"]
+KNOWN_FRACTION = 0.8
+LINES_PER_PAGE = 50
+SYLLABLES = ["ba", "co", "da", "fe", "gi", "ha", "jo", "ka", "lu", "ma", "ne", "po", "qua", "ri",
+             "sa", "te", "vo", "wi", "xa", "yo", "ze", "mar", "ton", "vel", "dor", "lin", "gar", "bel"]
+CITIES = ["Seattle WA", "Austin TX", "Denver CO", "Fresno CA", "Tampa FL", "Boise ID"]
+SUFFIXES = ["Market", "Grill", "Coffee", "Fuel", "Cinema", "Outlet", "Pharmacy", "Books", "Deli", "Store"]
+DISCLOSURE_WORDS = ["account", "balance", "notice", "errors", "questions", "electronic", "transfers", "overdraft",
+                    "protection", "the", "your", "we", "may", "must", "within", "sixty", "days", "after", "statement",
+                    "contact", "us", "agreement", "fees", "deposit", "insured", "by", "law", "rights"]
+
+
+def make_merchants(count, rng):
+    """Distinct merchant names made only of letters, so clean_label keeps them whole."""
+    merchants = []
+    seen = set()
+    while len(merchants) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = f"{word} {rng.choice(SUFFIXES)}"
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            merchants.append(name)
+    return merchants
+
+
+def make_categories(merchants, rng, known_fraction=KNOWN_FRACTION):
+    known = merchants[:int(len(merchants) * known_fraction)]
+    return {
+        "categories": list(CATEGORIES),
+        "merchants": {name.lower(): rng.choice(CATEGORIES) for name in known},
+    }
+
+
+def transaction_line(month, rng, merchants):
+    day = rng.randint(1, 28)
+    amount = f"{rng.randint(1, 2500)}.{rng.randint(0, 99):02d}"
+    balance = f"{rng.randint(1, 9)},{rng.randint(0, 999):03d}.{rng.randint(0, 99):02d}"
+    kind = rng.random()
+    if kind < 0.70:
+        # The store number cuts the location and card details off the label
+        return (f"{month}/{day} Purchase authorized on {month:02d}/{day:02d} {rng.choice(merchants)} "
+                f"{rng.randint(1, 9999)} {rng.choice(CITIES)} S{rng.randint(100000, 999999)} Card 1234 {amount}")
+    if kind < 0.75:
+        return f"{month}/{day} Zelle to {rng.choice(merchants).split()[0]} on {month:02d}/{day:02d} Ref # Pp0{rng.randint(1000, 9999)} {amount}"
+    if kind < 0.80:
+        return f"{month}/{day} Money Transfer authorized on {month}/{day} {rng.choice(merchants)} {amount} {balance}"
+    if kind < 0.85:
+        return f"{month}/{day} ATM Withdrawal authorized on {month:02d}/{day:02d} {rng.randint(100, 9999)} Main St {amount}"
+    return f"{month}/{day} Payroll Direct Dep {rng.randint(100000, 999999)} {amount} {balance}"
+
+
+def statement_lines(year, month, rng, merchants, pages=2):
+    """One statement: a fee-period header and LINES_PER_PAGE lines per page."""
+    lines = [f"Fee period {month:02d}/01/{year} - {month:02d}/28/{year}"]
+    while len(lines) < pages * LINES_PER_PAGE:
+        lines.append(transaction_line(month, rng, merchants))
+    return lines
+
+
+def disclosure_page(rng):
+    """A page of legal-looking text with no dates or amounts, like the back of a statement."""
+    return [" ".join(rng.choice(DISCLOSURE_WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+            for _ in range(LINES_PER_PAGE)]
+
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF with one line of Helvetica per statement line."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + i * 2} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font_id = 3 + len(pages) * 2
+    for i, lines in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + i * 2} 0 R "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode())
+        text = "".join("(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*\n"
+                       for line in lines)
+        stream = ("BT /F1 9 Tf 30 770 Td 14 TL\n" + text + "ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    with open(path, "wb") as file:
+        file.write(out)
+
+
+def iter_statements(statements, merchants, years, pages=2, seed=0):
+    """Yield the lines of each statement, cycling through the months of years."""
+    rng = random.Random(seed)
+    for i in range(statements):
+        year = years[(i // 12) % len(years)]
+        yield statement_lines(year, i % 12 + 1, rng, merchants, pages)
+
+
+def generate(directory, statements=1, pages=2, merchant_count=100, years=(2024,), text=False, seed=0, disclosures=0):
+    """Write the statements and categories.json into directory; returns the statement paths."""
+    rng = random.Random(seed)
+    merchants = make_merchants(merchant_count, rng)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "categories.json"), "w") as file:
+        json.dump(make_categories(merchants, rng), file)
+
+    paths = []
+    for i, lines in enumerate(iter_statements(statements, merchants, list(years), pages, seed)):
+        path = os.path.join(directory, f"statement_{i + 1:05d}." + ("txt" if text else "pdf"))
+        if text:
+            with open(path, "w") as file:
+                file.write("\n".join(lines) + "\n")
+        else:
+            pdf_pages = [lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)]
+            write_pdf(path, pdf_pages + [disclosure_page(rng) for _ in range(disclosures)])
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--statements", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--merchants", type=int, default=100)
+    parser.add_argument("--years", type=int, nargs="+", default=[2024])
+    parser.add_argument("--disclosures", type=int, default=0, help="pages without transactions added to each PDF")
+    parser.add_argument("--text", action="store_true", help="write statement lines as .txt instead of PDFs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate(args.directory, args.statements, args.pages, args.merchants, args.years, args.text, args.seed,
+                     args.disclosures)
+    print(f"Wrote {len(paths)} statements to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
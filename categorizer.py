@@ -0,0 +1,154 @@
+from collections import OrderedDict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+MATCH_THRESHOLD = 75
+# Unknown labels at least this similar are asked about once, as one group
+GROUP_THRESHOLD = 90
+# Upper bound on the number of cells in one cdist score matrix
+MAX_MATRIX_CELLS = 4_000_000
+
+
+class Categorizer:
+    """Maps purchase labels to categories using the merchant map.
+
+    A label is looked up exactly first (normalized to lower case). Otherwise
+    the fuzzy result is memoized per label in a bounded LRU cache, so every
+    distinct merchant is fuzzy-matched at most once. Cached results store the
+    matched merchant rather than the category, so changing a merchant's
+    category takes effect immediately.
+    """
+
+    def __init__(self, merchants, cache_size=4096):
+        self.merchants = merchants
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.choices = []
+        self.hits = 0
+        self.misses = 0
+        self.fuzzy_calls = 0
+        self.dirty = False
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the choice list, e.g. after editing merchants by hand."""
+        self.choices = list(self.merchants)
+        self.cache.clear()
+
+    def match(self, label):
+        """Return the category for label, or None if no merchant is close enough."""
+        return self.match_many([label])[label]
+
+    def match_many(self, labels):
+        """Categorize many labels with one batched fuzzy pass for the unknown ones."""
+        results = {}
+        pending = {}
+
+        for label in labels:
+            desc = label.lower()
+            if desc in self.merchants:
+                results[label] = self.merchants[desc]
+            elif desc in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(desc)
+                results[label] = self.category_for(self.cache[desc])
+            else:
+                pending.setdefault(desc, []).append(label)
+
+        if pending:
+            self.misses += len(pending)
+            for desc, best in zip(pending, self.fuzzy_match(list(pending))):
+                self.remember(desc, best)
+                for label in pending[desc]:
+                    results[label] = self.category_for(best)
+
+        return results
+
+    def fuzzy_match(self, queries):
+        """Return (merchant, score) or None for each query, like extractOne."""
+        if not self.choices:
+            return [None] * len(queries)
+
+        self.fuzzy_calls += 1
+        matches = []
+        chunk_size = max(1, MAX_MATRIX_CELLS // len(self.choices))
+        for start in range(0, len(queries), chunk_size):
+            scores = process.cdist(queries[start:start + chunk_size], self.choices,
+                                   scorer=fuzz.WRatio, score_cutoff=MATCH_THRESHOLD, workers=-1)
+            best_indexes = scores.argmax(axis=1)
+            for row, index in enumerate(best_indexes):
+                score = float(scores[row, index])
+                matches.append((self.choices[index], score) if score >= MATCH_THRESHOLD else None)
+        return matches
+
+    def category_for(self, best):
+        if best is None:
+            return None
+        return self.merchants.get(best[0])
+
+    def remember(self, desc, best):
+        self.cache[desc] = best
+        self.cache.move_to_end(desc)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def add_merchant(self, label, category):
+        """Record a new merchant and update cached matches incrementally."""
+        desc = label.lower()
+        is_new = desc not in self.merchants
+        self.merchants[desc] = category
+        self.dirty = True
+        self.cache.pop(desc, None)
+        if not is_new:
+            return
+
+        self.choices.append(desc)
+        if not self.cache:
+            return
+
+        # Only the new merchant can change a cached result, and only if it
+        # scores strictly higher (earlier merchants win ties, as in extractOne).
+        cached = list(self.cache)
+        scores = process.cdist(cached, [desc], scorer=fuzz.WRatio, score_cutoff=MATCH_THRESHOLD)
+        for row, cached_desc in enumerate(cached):
+            score = float(scores[row, 0])
+            best = self.cache[cached_desc]
+            if score >= MATCH_THRESHOLD and (best is None or score > best[1]):
+                self.cache[cached_desc] = (desc, score)
+
+    def group_labels(self, labels, threshold=GROUP_THRESHOLD):
+        """Group near-identical labels, keeping the order they were first seen in.
+
+        Each group is the first label not yet grouped plus every later
+        ungrouped label scoring at least threshold against it. Scores are
+        computed in blocks of rows against the labels after them, so at most
+        MAX_MATRIX_CELLS are held at once, and only the pairs above the
+        threshold are kept.
+        """
+        if not labels:
+            return []
+
+        descs = [label.lower() for label in labels]
+        similar = [[] for _ in descs]  # i -> later labels close to label i, in order
+        chunk_size = max(1, MAX_MATRIX_CELLS // len(descs))
+        for start in range(0, len(descs), chunk_size):
+            scores = process.cdist(descs[start:start + chunk_size], descs[start:], scorer=fuzz.token_sort_ratio,
+                                   score_cutoff=threshold, workers=-1)
+            rows, columns = np.nonzero(scores >= threshold)
+            for i, j in zip((rows + start).tolist(), (columns + start).tolist()):
+                if i < j:
+                    similar[i].append(j)
+
+        groups = []
+        assigned = [False] * len(labels)
+        for i, later in enumerate(similar):
+            if assigned[i]:
+                continue
+            group = [labels[i]]
+            for j in later:
+                if not assigned[j]:
+                    assigned[j] = True
+                    group.append(labels[j])
+            groups.append(group)
+        return groups
@@ -0,0 +1,248 @@
+"""Headless statement import, for running ingestion without the GUI.
+
+    python cli.py import PATH [PATH ...]      import files and directories once
+    python cli.py watch DIRECTORY             import PDFs dropped into a folder
+    python cli.py review [LABEL CATEGORY]     list or resolve queued merchants
+    python cli.py range START END             totals between two dates (YYYY-MM-DD)
+    python cli.py rebuild [--from-rows]       recompute all totals from the archived statements
+    python cli.py analytics                   trends and unusual spending for the latest period
+    python cli.py compact                     fold the ingest journal into the database
+    python cli.py export [PATH]               write every total to a database.json-style file
+
+import, watch, range and analytics take --account NAME to keep the statements
+of one card apart from those of others; without it they use the default
+account.
+
+Unknown merchants go to the review queue instead of prompting. Each import
+prints one line of JSON stats on stdout; backend messages go to stderr.
+Nothing here imports tkinter or matplotlib.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import date
+
+import metrics
+from atomic_file import atomic_write_json
+from backend import (collect_pdf_paths, compact_journal, get_query_engine, get_spending_matrix, import_files,
+                     load_user_data, rebuild_aggregates, rebuild_from_archive)
+from objects import DEFAULT_ACCOUNT
+from review_queue import ReviewQueue
+
+# A watch batch that fails is tried again after this long, doubling up to MAX_RETRY_SECONDS
+RETRY_SECONDS = 5.0
+MAX_RETRY_SECONDS = 300.0
+
+
+class StageTimer:
+    """Progress callback that adds up the wall time spent in each stage."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.stage = None
+        self.started = 0.0
+
+    def __call__(self, stage, done, total):
+        if stage != self.stage:
+            self.stop()
+            self.stage = stage
+            self.started = time.perf_counter()
+
+    def stop(self):
+        if self.stage is not None:
+            key = self.stage.lower().replace(' ', '_')
+            self.seconds[key] = self.seconds.get(key, 0.0) + time.perf_counter() - self.started
+            self.stage = None
+
+
+def run_import(user_data, paths, review_queue, workers=None, account=DEFAULT_ACCOUNT):
+    """Import paths into account as one batch and return its stats."""
+    timer = StageTimer()
+    stats = {}
+    start = time.perf_counter()
+    # Keep stdout for the JSON stats
+    with contextlib.redirect_stdout(sys.stderr):
+        import_files(user_data, paths, review_queue, workers, progress=timer, stats=stats, account=account)
+    timer.stop()
+    review_queue.save()
+
+    stats["review_queue"] = len(review_queue)
+    stats["stage_seconds"] = {stage: round(seconds, 4) for stage, seconds in timer.seconds.items()}
+    stats["total_seconds"] = round(time.perf_counter() - start, 4)
+    return stats
+
+
+def emit(stats):
+    print(json.dumps(stats), flush=True)
+
+
+def watch(user_data, directory, review_queue, interval=1.0, settle=5.0, workers=None, account=DEFAULT_ACCOUNT):
+    """Poll directory and import new or changed PDFs.
+
+    Files are collected until nothing has changed for settle seconds, so a
+    burst of drops (or a file still being copied) becomes one batch commit.
+    A batch that fails is kept and tried again with backoff; rows it
+    committed before failing are skipped as duplicates the next time.
+    """
+    imported = {}  # path -> (size, mtime) of files in a batch that finished
+    pending = {}
+    last_change = 0.0
+    retry_delay = 0.0
+    retry_at = 0.0
+
+    while True:
+        present = set()
+        for path in collect_pdf_paths([directory]):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            present.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if imported.get(path) != signature and pending.get(path) != signature:
+                pending[path] = signature
+                last_change = time.monotonic()
+        # Files removed before their batch ran
+        pending = {path: signature for path, signature in pending.items() if path in present}
+
+        now = time.monotonic()
+        if pending and now - last_change >= settle and now >= retry_at:
+            try:
+                stats = run_import(user_data, sorted(pending), review_queue, workers, account)
+            except Exception as e:
+                retry_delay = min(max(retry_delay * 2, RETRY_SECONDS), MAX_RETRY_SECONDS)
+                retry_at = time.monotonic() + retry_delay
+                emit({"error": str(e), "files": sorted(pending), "retry_seconds": retry_delay})
+            else:
+                # Every file was imported, or counted as a duplicate or unsupported
+                emit(stats)
+                imported.update(pending)
+                pending = {}
+                retry_delay = 0.0
+
+        time.sleep(interval)
+
+
+def review(review_queue, label=None, category=None):
+    if label is None:
+        emit(review_queue.entries)
+        return
+    review_queue.resolve(label, category)
+    review_queue.save()
+    emit({"resolved": label, "category": category, "review_queue": len(review_queue)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import bank statements without the GUI.")
+    parser.add_argument("--review-queue", default="review_queue.json", help="where unknown merchants are queued")
+    parser.add_argument("--metrics", action="store_true", help="log per-upload metrics to metrics.log and metrics.prom")
+    parser.add_argument("--profile", metavar="FILE", help="run the first upload under cProfile and write its stats to FILE")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import statement files and directories")
+    import_parser.add_argument("paths", nargs="+")
+    import_parser.add_argument("--workers", type=int, default=None)
+    import_parser.add_argument("--account", default=DEFAULT_ACCOUNT, help="account the statements belong to")
+
+    watch_parser = commands.add_parser("watch", help="import PDFs dropped into a folder")
+    watch_parser.add_argument("directory")
+    watch_parser.add_argument("--interval", type=float, default=1.0, help="seconds between folder scans")
+    watch_parser.add_argument("--settle", type=float, default=5.0, help="quiet seconds before a batch is committed")
+    watch_parser.add_argument("--workers", type=int, default=None)
+    watch_parser.add_argument("--account", default=DEFAULT_ACCOUNT, help="account the statements belong to")
+
+    review_parser = commands.add_parser("review", help="list queued merchants or give one a category")
+    review_parser.add_argument("label", nargs="?")
+    review_parser.add_argument("category", nargs="?")
+
+    range_parser = commands.add_parser("range", help="spent, earned and per-category totals between two dates")
+    range_parser.add_argument("start", type=date.fromisoformat)
+    range_parser.add_argument("end", type=date.fromisoformat)
+    range_parser.add_argument("--account", default=DEFAULT_ACCOUNT, help="account to total")
+
+    rebuild_parser = commands.add_parser("rebuild", help="recompute all totals from the archived statements")
+    rebuild_parser.add_argument("--workers", type=int, default=None)
+    rebuild_parser.add_argument("--from-rows", action="store_true",
+                                help="sum the stored transactions instead of re-reading the statements")
+
+    analytics_parser = commands.add_parser("analytics", help="trends and unusual spending for the latest period")
+    analytics_parser.add_argument("--account", default=DEFAULT_ACCOUNT, help="account to analyse")
+    analytics_parser.add_argument("--weekly", action="store_true", help="weekly periods instead of months")
+    analytics_parser.add_argument("--window", type=int, default=12, help="periods of history each period is compared to")
+    analytics_parser.add_argument("--method", choices=["mad", "zscore"], default="mad")
+    analytics_parser.add_argument("--threshold", type=float, default=3.5, help="score above which spending is unusual")
+
+    commands.add_parser("compact", help="fold the ingest journal into the database")
+
+    export_parser = commands.add_parser("export", help="write every total to a database.json-style file")
+    export_parser.add_argument("path", nargs="?", default="database.json")
+
+    args = parser.parse_args(argv)
+    review_queue = ReviewQueue(args.review_queue)
+    if args.metrics:
+        metrics.enable()
+    if args.profile:
+        metrics.profile_next_upload(args.profile)
+
+    if args.command == "review":
+        if args.label is not None and args.category is None:
+            parser.error("review needs both LABEL and CATEGORY")
+        review(review_queue, args.label, args.category)
+        return 0
+    if args.command == "range":
+        emit(get_query_engine(args.account).range_totals(args.start, args.end))
+        return 0
+
+    user_data = load_user_data()
+    if args.command == "import":
+        try:
+            emit(run_import(user_data, args.paths, review_queue, args.workers, args.account))
+        except Exception as e:
+            emit({"error": str(e)})
+            return 1
+        return 0
+
+    if args.command == "analytics":
+        user_data.load_all()
+        matrix = get_spending_matrix(user_data, args.account, args.weekly)
+        emit(matrix.report(args.window, args.method, args.threshold) or {"periods": 0})
+        return 0
+
+    if args.command == "compact":
+        emit({"compacted": compact_journal(user_data, force=True), "journal_seq": user_data.journal_seq})
+        return 0
+
+    if args.command == "export":
+        # Uploads still in the journal are included; nothing is marked as saved
+        data = user_data.save_data()
+        atomic_write_json(args.path, data)
+        emit({"path": args.path, "years": len(data), "journal_seq": user_data.journal_seq})
+        return 0
+
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.from_rows:
+                stats = {"account_years": rebuild_aggregates(user_data)}
+            else:
+                stats = {"statements": rebuild_from_archive(user_data, review_queue, args.workers,
+                                                            progress=lambda *args: None)}
+        review_queue.save()
+        emit({**stats, "years": user_data.get_years(),
+              "total_seconds": round(time.perf_counter() - start, 4)})
+        return 0
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    try:
+        watch(user_data, args.directory, review_queue, args.interval, args.settle, args.workers, args.account)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import hashlib
+import os
+
+import numpy as np
+
+from atomic_file import atomic_write_bytes
+from transaction_store import to_days
+
+# Above this many stored fingerprints, lookups go through a Bloom filter first
+BLOOM_THRESHOLD = 200_000
+BLOOM_BITS_PER_ITEM = 10
+BLOOM_HASHES = 7
+# Label used for deposits; clean_label strips '#', so no purchase label can equal it
+DEPOSIT_LABEL = "#deposit"
+
+
+def fingerprint(account, days, cents, label, ordinal):
+    """64-bit fingerprint of one transaction.
+
+    ordinal counts identical (date, amount, label) rows earlier in the same
+    statement, so two real coffees on the same day stay two rows while the
+    same coffee seen again in an overlapping statement matches.
+    """
+    key = f"{account}|{days}|{cents}|{label.lower()}|{ordinal}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+def fingerprint_rows(account, rows):
+    """Fingerprints of (days, cents, label) rows of one statement, as a uint64 array."""
+    seen = {}
+    fingerprints = np.empty(len(rows), dtype=np.uint64)
+    for i, row in enumerate(rows):
+        ordinal = seen.get(row, 0)
+        seen[row] = ordinal + 1
+        fingerprints[i] = fingerprint(account, *row, ordinal)
+    return fingerprints
+
+
+def fingerprint_summary(summary):
+    labels = sorted(summary.label_ids, key=summary.label_ids.get)
+    rows = []
+    for month, day, cents, label_id in zip(summary.row_months, summary.row_days,
+                                           summary.row_cents, summary.row_labels):
+        # Same date the transaction store records for the row
+        days = to_days(summary.year, month if month > 0 else 12, day)
+        rows.append((days, cents, labels[label_id] if label_id >= 0 else DEPOSIT_LABEL))
+    return fingerprint_rows(summary.account, rows)
+
+
+class BloomFilter:
+    """Bit-array prefilter: a miss means the fingerprint is certainly new."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = max(64, capacity * BLOOM_BITS_PER_ITEM)
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def positions(self, fingerprints):
+        # Double hashing on the two halves of the 64-bit fingerprint
+        low = fingerprints & np.uint64(0xFFFFFFFF)
+        high = fingerprints >> np.uint64(32)
+        steps = np.arange(BLOOM_HASHES, dtype=np.uint64)[:, None]
+        return (low[None, :] + steps * high[None, :]) % np.uint64(self.size)
+
+    def add(self, fingerprints):
+        positions = self.positions(fingerprints).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    def might_contain(self, fingerprints):
+        positions = self.positions(fingerprints)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=0)
+
+
+class FingerprintIndex:
+    """Fingerprints of every imported transaction, persisted as a sorted uint64 array.
+
+    The array is memory-mapped, so a history of millions of rows costs 8 bytes
+    a row on disk and only the pages a lookup touches in memory. Checks are
+    done for a whole upload at once with a binary search per fingerprint.
+    Fingerprints added since the last save are kept in a set. With
+    use_bloom (by default once there are BLOOM_THRESHOLD fingerprints) a
+    Bloom filter answers most lookups for new rows without touching the
+    array.
+    """
+
+    def __init__(self, directory="fingerprints", use_bloom=None):
+        self.directory = directory
+        self.use_bloom = use_bloom
+        self.stored = np.empty(0, dtype=np.uint64)
+        self.pending = set()
+        self.bloom = None
+        self.loaded = False
+
+    @property
+    def path(self):
+        # A directory of None gives an index that only lives in memory
+        return os.path.join(self.directory, "fingerprints.bin") if self.directory else None
+
+    def exists(self):
+        return self.path is not None and os.path.exists(self.path)
+
+    def __len__(self):
+        self.load()
+        return len(self.stored) + len(self.pending)
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.exists() and os.path.getsize(self.path):
+            self.stored = np.memmap(self.path, dtype=np.uint64, mode='r')
+        self.build_bloom()
+
+    def build_bloom(self):
+        count = len(self.stored) + len(self.pending)
+        use_bloom = self.use_bloom if self.use_bloom is not None else count >= BLOOM_THRESHOLD
+        self.bloom = None
+        if use_bloom:
+            self.bloom = BloomFilter(max(2 * count, BLOOM_THRESHOLD))
+            if len(self.stored):
+                self.bloom.add(np.asarray(self.stored))
+            if self.pending:
+                self.bloom.add(np.fromiter(self.pending, dtype=np.uint64))
+
+    def contains_many(self, fingerprints):
+        """Boolean array: which of fingerprints are already in the index."""
+        self.load()
+        found = np.zeros(len(fingerprints), dtype=bool)
+        candidates = np.arange(len(fingerprints))
+        if self.bloom is not None:
+            candidates = candidates[self.bloom.might_contain(fingerprints)]
+        if len(self.stored) and len(candidates):
+            values = fingerprints[candidates]
+            positions = np.searchsorted(self.stored, values)
+            positions[positions == len(self.stored)] = 0
+            found[candidates] = self.stored[positions] == values
+        if self.pending:
+            for i in candidates:
+                if not found[i] and int(fingerprints[i]) in self.pending:
+                    found[i] = True
+        return found
+
+    def add_many(self, fingerprints):
+        self.load()
+        self.pending.update(int(value) for value in fingerprints)
+        if self.bloom is not None:
+            if len(self) > self.bloom.capacity:
+                self.build_bloom()
+            else:
+                self.bloom.add(fingerprints)
+        elif self.use_bloom is None and len(self) >= BLOOM_THRESHOLD:
+            self.build_bloom()
+
+    def save(self):
+        self.load()
+        if not self.pending and self.exists():
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        merged = np.union1d(np.asarray(self.stored), np.fromiter(self.pending, dtype=np.uint64, count=len(self.pending)))
+        # Drop the old mapping before its file is replaced
+        self.stored = np.empty(0, dtype=np.uint64)
+        atomic_write_bytes(self.path, merged.astype(np.uint64).tobytes())
+        self.pending = set()
+        self.stored = np.memmap(self.path, dtype=np.uint64, mode='r') if len(merged) else merged
+
+    def build_from_store(self, store):
+        """Fingerprint the rows already in a transaction store, for histories older than the index."""
+        days = store.column("date")
+        amounts = store.column("amount")
+        merchants = store.column("merchant")
+        sources = store.column("source")
+        rows_by_source = {}
+        for day, cents, merchant, source in zip(days.tolist(), amounts.tolist(), merchants.tolist(), sources.tolist()):
+            label = store.merchants[merchant] if merchant >= 0 else DEPOSIT_LABEL
+            rows_by_source.setdefault(source, []).append((day, cents, label))
+        for source, rows in rows_by_source.items():
+            self.add_many(fingerprint_rows(store.source_accounts[source], rows))
+
+
+def drop_seen_rows(summaries, index):
+    """Remove rows already in index, or earlier in summaries, from each summary.
+
+    A row only matches rows of the same account. Returns (summaries,
+    fingerprints of the kept rows, number of rows dropped). Nothing is added
+    to index; call index.add_many once the rows are saved. Every row needs a
+    valid date (backend.check_dates drops the others when parsing).
+    """
+    kept_summaries = []
+    kept_fingerprints = []
+    batch = set()
+    skipped = 0
+    for summary in summaries:
+        fingerprints = fingerprint_summary(summary)
+        keep = ~index.contains_many(fingerprints)
+        for i in np.nonzero(keep)[0]:
+            value = int(fingerprints[i])
+            if value in batch:
+                keep[i] = False
+            else:
+                batch.add(value)
+        skipped += int(len(keep) - keep.sum())
+        kept_summaries.append(summary if keep.all() else summary.select_rows(keep))
+        kept_fingerprints.append(fingerprints[keep])
+    fingerprints = np.concatenate(kept_fingerprints) if kept_fingerprints else np.empty(0, dtype=np.uint64)
+    return kept_summaries, fingerprints, skipped
@@ -1,8 +1,42 @@
 import tkinter as tk
-from tkinter import ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-from backend import upload_file
+import math
+import time
+from collections import OrderedDict
+import queue
+from tkinter import filedialog, ttk
+from objects import DEFAULT_ACCOUNT, MONTH_INDEXES, MONTH_NAMES
+from upload_worker import UploadWorker
+
+PIE_COLORS = [
+    "#2c0be9",  # Food
+    "#c1f507",  # Transportation
+    "#f3bd0b",  # Entertainment
+    "#08d6aa",  # Shopping
+    "#af301f",  # Bills
+    "#0BB8E4FF"  # Other
+]
+PIE_EXPLODE = 0.05
+PIE_START_ANGLE = 90
+PIE_LABEL_DISTANCE = 1.2
+PIE_PCT_DISTANCE = 0.6
+PIE_BITMAP_CACHE_SIZE = 32
+UPLOAD_POLL_MS = 50
+# How DEFAULT_ACCOUNT is shown in the account dropdown
+DEFAULT_ACCOUNT_LABEL = "Default"
+
+
+def pie_autopct(pct):
+    return f'{pct:.1f}%' if pct >= 5 else ''  # Only show percentages >= 5%
+
+
+def upload_message(count, stats):
+    """Status line for a finished upload, telling duplicates and unsupported files apart."""
+    message = f"Uploaded {count} file(s)."
+    if stats["duplicates"]:
+        message += f" {stats['duplicates']} already uploaded."
+    if stats["unsupported"]:
+        message += f" {stats['unsupported']} not a supported statement."
+    return message
 
 
 class FinanceTrackerGUI:
@@ -11,6 +45,12 @@ class FinanceTrackerGUI:
         self.root.title("Finance Analysis Tracker")
         self.root.geometry("1000x700")
         self.user_data = user_data
+        self.startup_times = {}
+        self.year_pie_canvas = None
+        self.month_pie_canvas = None
+        self.upload_worker = None
+        # Analytics wait for the first paint, like the charts
+        self.analytics_enabled = False
 
         # Container for screens
         self.container = tk.Frame(root)
@@ -49,17 +89,44 @@ class FinanceTrackerGUI:
 
         self.show_dashboard()
 
+        # Show the window with its numbers first; matplotlib is loaded and
+        # the pie charts are drawn once the first frame is on screen.
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        self.startup_times["first_paint"] = time.perf_counter()
+        self.year_pie_canvas = self.create_pie_chart(self.year_chart_frame)
+        self.month_pie_canvas = self.create_pie_chart(self.month_chart_frame)
+        self.analytics_enabled = True
+        if self.year_var.get():
+            try:
+                self.update_yearly_data(self.year_var.get())
+                self.update_monthly_data(self.year_var.get(), self.month_var.get())
+            except Exception as e:
+                print(f"Initial chart update error: {e}")
+        self.update_range_data()
+        self.startup_times["charts"] = time.perf_counter()
+
 
     # ---------------- Dashboard ----------------
     def build_dashboard(self, parent):
         top_frame = tk.Frame(parent)
         top_frame.pack(side="top", fill="x", pady=10, padx=10)
 
+        # Account dropdown; typing a new name sends the next upload to a new account
+        self.account_var = tk.StringVar()
+        tk.Label(top_frame, text="Account:").pack(side="left", padx=5)
+        self.account_dropdown = ttk.Combobox(top_frame, textvariable=self.account_var, width=14)
+        self.account_dropdown['values'] = self.account_labels()
+        self.account_dropdown.current(0)
+        self.account_dropdown.pack(side="left", padx=5)
+        self.account_dropdown.bind("<<ComboboxSelected>>", self.on_account_change)
+
         # Year dropdown
         self.year_var = tk.StringVar()
         tk.Label(top_frame, text="Select Year:").pack(side="left", padx=5)
         self.year_dropdown = ttk.Combobox(top_frame, textvariable=self.year_var, state="readonly")
-        self.year_dropdown['values'] = self.user_data.get_years()
+        self.year_dropdown['values'] = self.user_data.get_years(self.selected_account())
         if self.year_dropdown['values']:
             self.year_dropdown.current(0)
         self.year_dropdown.pack(side="left", padx=5)
@@ -69,10 +136,7 @@ class FinanceTrackerGUI:
         self.month_var = tk.StringVar()
         tk.Label(top_frame, text="Select Month:").pack(side="left", padx=5)
         self.month_dropdown = ttk.Combobox(top_frame, textvariable=self.month_var, state="readonly")
-        self.month_dropdown['values'] = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
+        self.month_dropdown['values'] = MONTH_NAMES
         if self.month_dropdown['values']:
             self.month_dropdown.current(0)
         self.month_dropdown.pack(side="left", padx=5)
@@ -96,7 +160,14 @@ class FinanceTrackerGUI:
         bottom_frame = tk.Frame(parent)
         bottom_frame.pack(side="bottom", fill="x", pady=10)
         self.upload_button = tk.Button(bottom_frame, text="Upload New Data", command=self.upload_data)
-        self.upload_button.pack()
+        self.upload_button.pack(side="left", expand=True)
+        self.upload_folder_button = tk.Button(bottom_frame, text="Upload Folder", command=self.upload_folder)
+        self.upload_folder_button.pack(side="left", expand=True)
+        self.cancel_upload_button = tk.Button(bottom_frame, text="Cancel Upload", command=self.cancel_upload, state="disabled")
+        self.cancel_upload_button.pack(side="left", expand=True)
+
+        self.upload_status_label = tk.Label(parent, text="")
+        self.upload_status_label.pack(side="bottom", fill="x")
 
     def build_yearly_data(self, frame):
         self.year_stats_label = tk.Label(frame, text="Yearly Data", font=("Helvetica", 14, "bold"))
@@ -114,7 +185,13 @@ class FinanceTrackerGUI:
         self.year_avg_earning_label = tk.Label(frame, text="Average Earning: $0.00")
         self.year_avg_earning_label.pack(pady=5)
 
-        self.year_pie_canvas = self.create_pie_chart(frame, "Yearly Spending Breakdown")
+        self.last_90_days_label = tk.Label(frame, text="Last 90 Days Spent: $0.00")
+        self.last_90_days_label.pack(pady=5)
+
+        self.trailing_average_label = tk.Label(frame, text="12-Month Average Spending: $0.00")
+        self.trailing_average_label.pack(pady=5)
+
+        self.year_chart_frame = self.create_chart_frame(frame, "Yearly Spending Breakdown")
 
     def build_monthly_data(self, frame):
         self.month_stats_label = tk.Label(frame, text="Monthly Data", font=("Helvetica", 14, "bold"))
@@ -126,17 +203,53 @@ class FinanceTrackerGUI:
         self.month_total_earned_label = tk.Label(frame, text="Total Earned: $0.00")
         self.month_total_earned_label.pack(pady=5)
 
-        self.month_pie_canvas = self.create_pie_chart(frame, "Monthly Spending Breakdown")
+        self.month_change_label = tk.Label(frame, text="")
+        self.month_change_label.pack(pady=5)
+
+        self.month_anomalies_label = tk.Label(frame, text="", justify="left")
+        self.month_anomalies_label.pack(pady=5)
 
-    def create_pie_chart(self, frame, title):
+        self.month_chart_frame = self.create_chart_frame(frame, "Monthly Spending Breakdown")
+
+    def create_chart_frame(self, frame, title):
         tk.Label(frame, text=title, font=("Helvetica", 12, "bold")).pack(pady=5)
-        fig, ax = plt.subplots(figsize=(4, 4))
+        chart_frame = tk.Frame(frame)
+        chart_frame.pack(fill="both", expand=True)
+        return chart_frame
+
+    def create_pie_chart(self, frame):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(4, 4))
+        ax = fig.add_subplot()
         canvas = FigureCanvasTkAgg(fig, master=frame)
         canvas.get_tk_widget().pack(fill="both", expand=True)
-        return {"fig": fig, "ax": ax, "canvas": canvas}
+        pie_canvas = {
+            "fig": fig, "ax": ax, "canvas": canvas,
+            "key": None,          # (year, month, data version) currently shown
+            "pending": None,      # latest (categories, key) waiting to be drawn
+            "scheduled": False,
+            "labels": None,       # labels of the wedges currently on the axes
+            "pie": None,          # (wedges, texts, autotexts)
+            "layout_bounds": None,  # figure bounds the layout was computed for
+            "bitmaps": OrderedDict(),
+        }
+        # The canvas follows the window size; lay out again before the resized figure is drawn
+        canvas.mpl_connect("resize_event", lambda event: self.layout_pie(pie_canvas))
+        return pie_canvas
+
+    def account_labels(self):
+        labels = [account or DEFAULT_ACCOUNT_LABEL for account in self.user_data.get_accounts()]
+        return labels or [DEFAULT_ACCOUNT_LABEL]
+
+    def selected_account(self):
+        label = self.account_var.get().strip()
+        return DEFAULT_ACCOUNT if label in ("", DEFAULT_ACCOUNT_LABEL) else label
 
     def update_yearly_data(self, year):
-        year_data = next((y for y in self.user_data.years if y.year == int(year)), None)
+        # Loads the account-year from storage the first time it is shown
+        year_data = self.user_data.get_year(int(year), account=self.selected_account())
         if not year_data:
             return
 
@@ -146,57 +259,185 @@ class FinanceTrackerGUI:
         self.year_avg_spending_label.config(text=f"Average Spending: ${year_data.average_spending:.2f}")
         self.year_avg_earning_label.config(text=f"Average Earning: ${year_data.average_earning:.2f}")
 
-        self.update_pie_chart(self.year_pie_canvas, year_data.categories)
+        self.update_pie_chart(self.year_pie_canvas, year_data.categories, (year_data.year, None, year_data.version))
 
     def update_monthly_data(self, year, month):
-        year_data = next((y for y in self.user_data.years if y.year == int(year)), None)
+        year_data = self.user_data.get_year(int(year), account=self.selected_account())
         if not year_data:
             return
 
-        month_index = self.month_dropdown['values'].index(month)
+        month_index = MONTH_INDEXES[month]
         month_data = year_data.months[month_index]
 
         self.month_stats_label.config(text=f"Month: {month}")
         self.month_total_spent_label.config(text=f"Total Spent: ${month_data.total_spent:.2f}")
         self.month_total_earned_label.config(text=f"Total Earned: ${month_data.total_earned:.2f}")
 
-        self.update_pie_chart(self.month_pie_canvas, month_data.categories)
+        self.update_pie_chart(self.month_pie_canvas, month_data.categories, (year_data.year, month_index, year_data.version))
+        self.schedule_month_analytics(year_data.year, month_index + 1)
+
+    def schedule_month_analytics(self, year, month):
+        # NumPy and the transaction store are loaded on the first call, so never before the first paint
+        if self.analytics_enabled:
+            self.root.after_idle(self.update_month_analytics, year, month)
+
+    def update_month_analytics(self, year, month):
+        # The matrix and its scores are cached per data version, so switching months is cheap.
+        # Only loaded years are used: a year the user has not opened stays on disk
+        from backend import get_spending_matrix
+
+        try:
+            matrix = get_spending_matrix(self.user_data, self.selected_account())
+        except Exception as e:
+            print(f"Analytics error: {e}")
+            return
+        row = matrix.row_of(year, month)
+        if row is None or row == 0:
+            self.month_change_label.config(text="")
+            self.month_anomalies_label.config(text="")
+            return
+
+        totals = matrix.totals()
+        change = int(totals[row] - totals[row - 1]) / 100
+        text = f"vs Previous Month: {'+' if change >= 0 else '-'}${abs(change):.2f}"
+        if totals[row - 1]:
+            text += f" ({100 * change / (totals[row - 1] / 100):+.0f}%)"
+        self.month_change_label.config(text=text)
+
+        anomalies = matrix.anomalies(rows=[row])[:3]
+        self.month_anomalies_label.config(text="\n".join(
+            f"Unusually high: {anomaly['category']} ${anomaly['spent']:.2f}" for anomaly in anomalies))
+
+    def update_range_data(self):
+        # Rolling windows end at the last transaction, since statements arrive after the fact
+        from backend import get_query_engine
+
+        try:
+            engine = get_query_engine(self.selected_account())
+        except Exception as e:
+            print(f"Range query error: {e}")
+            return
+        last_days = engine.last_days(90)
+        trailing = engine.trailing_average(12)
+        if last_days is None:
+            # Nothing imported for this account yet
+            self.last_90_days_label.config(text="Last 90 Days Spent: $0.00")
+            self.trailing_average_label.config(text="12-Month Average Spending: $0.00")
+            return
+        self.last_90_days_label.config(text=f"Last 90 Days Spent: ${last_days['total_spent']:.2f} (to {last_days['end']})")
+        self.trailing_average_label.config(text=f"12-Month Average Spending: ${trailing['average_spending']:.2f}")
+
+    def update_pie_chart(self, pie_canvas, categories, key=None):
+        if pie_canvas is None:
+            # Charts are not built until after the first frame
+            return
+        if key is not None and key == pie_canvas["key"] and pie_canvas["pending"] is None:
+            return
+
+        # Coalesce rapid selection changes into one draw of the latest one
+        pie_canvas["pending"] = (categories, key)
+        if not pie_canvas["scheduled"]:
+            pie_canvas["scheduled"] = True
+            self.root.after_idle(self.draw_pie_chart, pie_canvas)
+
+    def draw_pie_chart(self, pie_canvas):
+        categories, key = pie_canvas["pending"]
+        pie_canvas["pending"] = None
+        pie_canvas["scheduled"] = False
+        if key is not None and key == pie_canvas["key"]:
+            return
 
-    def update_pie_chart(self, pie_canvas, categories):
+        filtered_categories = {k: v for k, v in categories.items() if v > 0}
+        labels = tuple(filtered_categories)
+        if labels and labels == pie_canvas["labels"]:
+            # Same wedges, new values: move them instead of rebuilding the axes
+            self.move_pie_wedges(pie_canvas, list(filtered_categories.values()))
+        else:
+            self.build_pie(pie_canvas, filtered_categories)
+            pie_canvas["labels"] = labels
+
+        canvas = pie_canvas["canvas"]
+        self.layout_pie(pie_canvas)
+
+        bitmaps = pie_canvas["bitmaps"]
+        bitmap_key = (key, tuple(pie_canvas["fig"].bbox.bounds))
+        if key is not None and bitmap_key in bitmaps:
+            bitmaps.move_to_end(bitmap_key)
+            canvas.restore_region(bitmaps[bitmap_key])
+            canvas.blit(pie_canvas["fig"].bbox)
+        else:
+            canvas.draw()
+            if key is not None:
+                bitmaps[bitmap_key] = canvas.copy_from_bbox(pie_canvas["fig"].bbox)
+                while len(bitmaps) > PIE_BITMAP_CACHE_SIZE:
+                    bitmaps.popitem(last=False)
+        pie_canvas["key"] = key
+
+    def layout_pie(self, pie_canvas):
+        # tight_layout is slow, so it only runs again when the figure size changes
+        bounds = tuple(pie_canvas["fig"].bbox.bounds)
+        if bounds != pie_canvas["layout_bounds"]:
+            pie_canvas["fig"].tight_layout()
+            pie_canvas["layout_bounds"] = bounds
+
+    def build_pie(self, pie_canvas, filtered_categories):
         pie_canvas["ax"].clear()
-        if not categories or all(value == 0 for value in categories.values()):  # Check if categories are empty or all zeros
+        pie_canvas["pie"] = None
+        if not filtered_categories:  # Check if categories are empty or all zeros
             pie_canvas["ax"].text(0.5, 0.5, "No Data", fontsize=14, ha='center', va='center')
-        else:
-            filtered_categories = {k: v for k, v in categories.items() if v > 0}
-            labels = filtered_categories.keys()
-            values = filtered_categories.values()
-
-            custom_colors = [
-                "#2c0be9",  # Food
-                "#c1f507",  # Transportation
-                "#f3bd0b",  # Entertainment
-                "#08d6aa",  # Shopping
-                "#af301f",  # Bills
-                "#0BB8E4FF"  # Other
-            ]
-
-            def autopct_func(pct):
-                return f'{pct:.1f}%' if pct >= 5 else ''  # Only show percentages >= 5%
-
-            pie_canvas["ax"].pie(
-            values,
-            labels=labels,
-            explode=[0.05] * len(labels),  
-            shadow=True,
-            autopct=autopct_func,
-            colors=custom_colors,
-            startangle=90, 
-            labeldistance=1.2,  
-            pctdistance=0.6,  
-            wedgeprops={"linewidth": 1, "edgecolor": "black"}  
-            )
-        pie_canvas["fig"].tight_layout()
-        pie_canvas["canvas"].draw()
+            return
+
+        labels = filtered_categories.keys()
+        values = filtered_categories.values()
+
+        pie_canvas["pie"] = pie_canvas["ax"].pie(
+        values,
+        labels=labels,
+        explode=[PIE_EXPLODE] * len(labels),  
+        shadow=True,
+        autopct=pie_autopct,
+        colors=PIE_COLORS,
+        startangle=PIE_START_ANGLE, 
+        labeldistance=PIE_LABEL_DISTANCE,  
+        pctdistance=PIE_PCT_DISTANCE,  
+        wedgeprops={"linewidth": 1, "edgecolor": "black"}  
+        )
+
+    def move_pie_wedges(self, pie_canvas, values):
+        # Same geometry as Axes.pie; shadows follow their wedge automatically
+        wedges, texts, autotexts = pie_canvas["pie"]
+        total = sum(values)
+        theta1 = PIE_START_ANGLE / 360
+        for wedge, text, autotext, value in zip(wedges, texts, autotexts, values):
+            theta2 = theta1 + value / total
+            thetam = math.pi * (theta1 + theta2)
+            x = PIE_EXPLODE * math.cos(thetam)
+            y = PIE_EXPLODE * math.sin(thetam)
+            wedge.set_center((x, y))
+            wedge.set_theta1(360 * theta1)
+            wedge.set_theta2(360 * theta2)
+
+            label_x = x + PIE_LABEL_DISTANCE * math.cos(thetam)
+            text.set_position((label_x, y + PIE_LABEL_DISTANCE * math.sin(thetam)))
+            text.set_horizontalalignment('left' if label_x > 0 else 'right')
+            autotext.set_position((x + PIE_PCT_DISTANCE * math.cos(thetam), y + PIE_PCT_DISTANCE * math.sin(thetam)))
+            autotext.set_text(pie_autopct(100 * value / total))
+            theta1 = theta2
+
+    def on_account_change(self, event):
+        self.update_year_choices()
+        if self.year_var.get():
+            self.update_yearly_data(self.year_var.get())
+            self.update_monthly_data(self.year_var.get(), self.month_var.get())
+        self.update_range_data()
+
+    def update_year_choices(self):
+        years = self.user_data.get_years(self.selected_account())
+        self.year_dropdown['values'] = years
+        if years and self.year_var.get() not in [str(year) for year in years]:
+            self.year_dropdown.current(0)
+        elif not years:
+            self.year_var.set("")
 
     def on_year_change(self, event):
         selected_year = self.year_var.get()
@@ -208,19 +449,97 @@ class FinanceTrackerGUI:
         selected_month = self.month_var.get()
         self.update_monthly_data(selected_year, selected_month)
 
-    def upload_data(self):
-        try:
-            print("Starting file upload...")
-            upload_file(self.user_data, self.ask_user_category_gui)
-            print("File uploaded successfully. Updating dashboard...")
+    def refresh_dashboard(self):
+        self.account_dropdown['values'] = self.account_labels()
+        self.update_year_choices()
+        if self.year_var.get():
             self.update_yearly_data(self.year_var.get())
             self.update_monthly_data(self.year_var.get(), self.month_var.get())
+        self.update_range_data()
+
+    def upload_data(self):
+        file_path = filedialog.askopenfilename(
+            title="Select a PDF File",
+            filetypes=[("PDF Files", "*.pdf"), ("All Files", "*.*")]
+        )
+        if not file_path:
+            print("No file selected.")
+            return
+        self.start_upload([file_path])
+
+    def upload_folder(self):
+        directory = filedialog.askdirectory(title="Select a Folder of PDF Statements")
+        if not directory:
+            print("No folder selected.")
+            return
+        self.start_upload([directory])
+
+    # ---------------- Background upload ----------------
+    def start_upload(self, paths):
+        if self.upload_worker is not None:
+            return
+        print(f"Starting upload of {paths}...")
+        self.upload_worker = UploadWorker(self.user_data, paths, account=self.selected_account())
+        self.upload_button.config(state="disabled")
+        self.upload_folder_button.config(state="disabled")
+        self.cancel_upload_button.config(state="normal")
+        self.upload_status_label.config(text="Starting upload...")
+        self.upload_worker.start()
+        self.root.after(UPLOAD_POLL_MS, self.poll_upload)
+
+    def cancel_upload(self):
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+            self.upload_status_label.config(text="Cancelling upload...")
             self.show_dashboard()
+
+    def poll_upload(self):
+        # Runs on the Tk thread: handle everything the worker posted since the last poll
+        worker = self.upload_worker
+        while True:
+            try:
+                kind, payload = worker.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                stage, done, total = payload
+                self.upload_status_label.config(text=f"{stage} ({done}/{total})")
+            elif kind == "ask":
+                self.show_category_prompt(*payload)
+            elif kind == "apply":
+                fn, reply = payload
+                try:
+                    fn()
+                except Exception as e:
+                    # Raised again on the worker, which then reports the upload as failed
+                    reply.set(e)
+                else:
+                    reply.set()
+            else:
+                self.finish_upload(kind, payload)
+                return
+
+        self.root.after(UPLOAD_POLL_MS, self.poll_upload)
+
+    def finish_upload(self, kind, payload):
+        self.upload_worker = None
+        self.upload_button.config(state="normal")
+        self.upload_folder_button.config(state="normal")
+        self.cancel_upload_button.config(state="disabled")
+        self.show_dashboard()
+
+        if kind == "done":
+            message = upload_message(*payload)
+            self.upload_status_label.config(text=message)
+            print(message)
+            self.refresh_dashboard()
             print("Dashboard updated successfully.")
-        except FileNotFoundError:
-            print("No file was selected for upload.")
-        except Exception as e:
-            print(f"An error occurred during file upload: {e}")
+        elif kind == "cancelled":
+            self.upload_status_label.config(text="Upload cancelled.")
+        else:
+            self.upload_status_label.config(text=f"Upload failed: {payload}")
+            print(f"An error occurred during file upload: {payload}")
 
     # ---------------- Categorization ----------------
     def build_categorization(self, parent):
@@ -237,25 +556,19 @@ class FinanceTrackerGUI:
         self.submit_button = tk.Button(parent, text="Submit")
         self.submit_button.pack(pady=20)
 
-    def ask_user_category_gui(self, label, categories):
+        tk.Button(parent, text="Cancel Upload", command=self.cancel_upload).pack()
+
+    def show_category_prompt(self, label, categories, reply):
         self.uncategorized_label.config(text=f"Transaction: {label}")
         self.category_dropdown['values'] = categories
         self.category_var.set(categories[0])
 
-        self.show_categorization()
-
-        done = tk.BooleanVar(value=False)
-
         def submit():
-            done.set(True)
+            self.show_dashboard()
+            reply.set(self.category_var.get())
 
         self.submit_button.config(command=submit)
-
-        self.root.wait_variable(done)
-
-        self.show_dashboard()
-
-        return self.category_var.get()
+        self.show_categorization()
 
     # ---------------- Screen Switching ----------------
     def show_dashboard(self):
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from atomic_file import atomic_write_json
+
+HASH_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$')
+
+
+def hash_file(file_path):
+    hash_sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(65536):
+            hash_sha256.update(chunk)
+    return hash_sha256.hexdigest()
+
+
+class HashIndex:
+    """Content-addressed index of the statements stored in storage_dir.
+
+    Maps file hash -> {"filename", "size", "mtime"}. Stored files are named
+    after their hash, so a lookup is a dict access plus a single stat call.
+    The index lives next to the storage directory and records the directory
+    mtime, so files added or removed outside the app are picked up lazily on
+    the next load without re-hashing files that did not change.
+    """
+
+    def __init__(self, storage_dir="uploaded_files", index_path=None):
+        self.storage_dir = storage_dir
+        self.index_path = index_path or os.path.normpath(storage_dir) + "_index.json"
+        self.entries = {}
+        self.dir_mtime = None
+        self.loaded = False
+
+    def load(self):
+        if self.loaded:
+            return
+        if not os.path.exists(self.storage_dir):
+            os.makedirs(self.storage_dir)
+
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as file:
+                    data = json.load(file)
+                self.entries = data.get("entries", {})
+                self.dir_mtime = data.get("dir_mtime")
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Hash index unreadable, rebuilding: {e}")
+                self.entries = {}
+                self.dir_mtime = None
+
+        self.loaded = True
+        if self.dir_mtime != os.stat(self.storage_dir).st_mtime_ns:
+            self.rebuild()
+
+    def save(self):
+        self.dir_mtime = os.stat(self.storage_dir).st_mtime_ns
+        atomic_write_json(self.index_path, {"dir_mtime": self.dir_mtime, "entries": self.entries}, indent=None)
+
+    def rebuild(self):
+        """Reconcile the index with the storage directory.
+
+        Only files whose name, size or mtime no longer match an entry are
+        hashed again. Files that are not named after their hash yet (older
+        uploads) are renamed so later lookups never need a directory scan.
+        """
+        by_filename = {entry["filename"]: file_hash for file_hash, entry in self.entries.items()}
+        entries = {}
+
+        for filename in sorted(os.listdir(self.storage_dir)):
+            path = os.path.join(self.storage_dir, filename)
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+
+            file_hash = by_filename.get(filename)
+            entry = self.entries.get(file_hash) if file_hash else None
+            if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+                file_hash = hash_file(path)
+
+            if file_hash in entries:
+                # Same content stored twice; keep the first copy indexed.
+                continue
+
+            if not HASH_NAME_PATTERN.match(filename) or not filename.startswith(file_hash):
+                new_filename = file_hash + os.path.splitext(filename)[1].lower()
+                new_path = os.path.join(self.storage_dir, new_filename)
+                if not os.path.exists(new_path):
+                    os.replace(path, new_path)
+                    filename = new_filename
+                    stat = os.stat(new_path)
+
+            entries[file_hash] = {"filename": filename, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+        self.entries = entries
+        self.save()
+
+    def lookup(self, file_hash):
+        """Return the stored path for file_hash, or None if it isn't stored."""
+        self.load()
+        entry = self.entries.get(file_hash)
+        if not entry:
+            return None
+
+        path = os.path.join(self.storage_dir, entry["filename"])
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            del self.entries[file_hash]
+            self.save()
+            return None
+
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime"]:
+            # Changed outside the app; revalidate just this file.
+            del self.entries[file_hash]
+            actual_hash = hash_file(path)
+            self.entries[actual_hash] = {"filename": entry["filename"], "size": stat.st_size, "mtime": stat.st_mtime_ns}
+            self.save()
+            if actual_hash != file_hash:
+                return None
+        return path
+
+    def contains(self, file_hash):
+        return self.lookup(file_hash) is not None
+
+    def add(self, file_path, file_hash, save=True):
+        """Copy file_path into storage under its hash and record it.
+
+        With save=False the index file is not rewritten; call save() once
+        after a batch. Files copied but not saved yet are picked up by
+        rebuild() on the next load, since the directory mtime changed.
+        """
+        self.load()
+        filename = file_hash + os.path.splitext(file_path)[1].lower()
+        path = os.path.join(self.storage_dir, filename)
+        shutil.copy(file_path, path)
+
+        stat = os.stat(path)
+        self.entries[file_hash] = {"filename": filename, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+        if save:
+            self.save()
+        return path
@@ -0,0 +1,136 @@
+"""Append-only journal of committed uploads.
+
+Each upload is one line: the CRC32 of a JSON record, then the record, which
+holds every imported statement's file hash, account, parsed rows and row
+fingerprints, and the category given to each label. The line is written
+and fsync'd before the upload changes anything else, so the journal is what
+decides whether an upload landed. On startup, records newer than the
+database snapshot are applied again, and a line cut short by a crash is
+dropped. Compaction saves the totals with the sequence number of the last
+record they include and empties the journal.
+"""
+import json
+import os
+import zlib
+from array import array
+
+from atomic_file import atomic_write_bytes
+from objects import StatementSummary
+
+
+def encode_line(record):
+    data = json.dumps(record, separators=(",", ":")).encode()
+    return b"%08x " % zlib.crc32(data) + data + b"\n"
+
+
+def decode_line(line):
+    """The record of one journal line, or None if it is incomplete or corrupt."""
+    if not line.endswith(b"\n"):
+        return None
+    checksum, _, data = line[:-1].partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(data):
+            return None
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def statement_entry(summary, file_hash, fingerprints):
+    """Journal form of a statement's rows, as parallel columns."""
+    return {
+        "hash": file_hash,
+        "account": summary.account,
+        "year": summary.year,
+        "parser": summary.parser_name,
+        "labels": summary.label_list(),
+        "months": summary.row_months.tolist(),
+        "days": summary.row_days.tolist(),
+        "cents": summary.row_cents.tolist(),
+        "label_ids": summary.row_labels.tolist(),
+        "fingerprints": [format(int(value), "x") for value in fingerprints],
+    }
+
+
+def entry_summary(entry):
+    summary = StatementSummary()
+    summary.year = entry["year"]
+    summary.account = entry["account"]
+    summary.parser_name = entry["parser"]
+    summary.load_rows(entry["labels"], array('b', entry["months"]), array('b', entry["days"]),
+                      array('q', entry["cents"]), array('i', entry["label_ids"]))
+    return summary
+
+
+class IngestJournal:
+    """The journal file, plus the sequence number and size of what it holds."""
+
+    def __init__(self, path="ingest_journal.jsonl"):
+        self.path = path
+        self.last_seq = 0
+        self.count = 0
+        self.size = 0
+        self.loaded = False
+
+    def read(self):
+        """Every intact record in order. A torn or corrupt tail is cut off the file."""
+        records = []
+        valid_size = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                for line in file:
+                    record = decode_line(line)
+                    if record is None:
+                        break
+                    records.append(record)
+                    valid_size += len(line)
+            file_size = os.path.getsize(self.path)
+            if valid_size != file_size:
+                print(f"Dropping {file_size - valid_size} bytes of an unfinished record from {self.path}")
+                with open(self.path, 'r+b') as file:
+                    file.truncate(valid_size)
+                    file.flush()
+                    os.fsync(file.fileno())
+
+        self.loaded = True
+        self.count = len(records)
+        self.size = valid_size
+        if records:
+            self.last_seq = max(self.last_seq, records[-1]["seq"])
+        return records
+
+    def append(self, record, after_seq=0):
+        """Write record as the next line and fsync it; returns its sequence number.
+
+        after_seq is the last sequence number already in the snapshot, so
+        numbers keep increasing after the journal was emptied.
+        """
+        if not self.loaded:
+            self.read()
+        seq = max(self.last_seq, after_seq) + 1
+        line = encode_line(dict(record, seq=seq))
+        created = not os.path.exists(self.path)
+        with open(self.path, 'ab') as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        if created:
+            # Make the new file's directory entry durable too
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+        self.last_seq = seq
+        self.count += 1
+        self.size += len(line)
+        return seq
+
+    def clear(self, through_seq):
+        """Drop the records up to through_seq once a saved snapshot includes them."""
+        kept = [record for record in self.read() if record["seq"] > through_seq]
+        data = b"".join(encode_line(record) for record in kept)
+        atomic_write_bytes(self.path, data)
+        self.count = len(kept)
+        self.size = len(data)
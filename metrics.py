@@ -0,0 +1,164 @@
+"""Per-upload timing spans and counters.
+
+Metrics are off unless FINANCE_TRACKER_METRICS is set or enable() is called.
+While they are off, metrics.current is a NullMetrics whose span() hands back
+one shared no-op context manager, so instrumented code pays for a method call
+and nothing else. When on, every upload appends one JSON line to log_path and
+rewrites prometheus_path in the Prometheus text format.
+
+Set FINANCE_TRACKER_PROFILE=FILE or call profile_next_upload(FILE) to run the
+next upload under cProfile and dump its stats to FILE.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from atomic_file import atomic_write_text
+
+PROMETHEUS_PREFIX = "finance_tracker_upload"
+
+enabled = bool(os.environ.get("FINANCE_TRACKER_METRICS"))
+log_path = "metrics.log"
+prometheus_path = "metrics.prom"
+profile_path = os.environ.get("FINANCE_TRACKER_PROFILE")
+
+
+class Span:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class NullMetrics:
+    """Stand-in used while metrics are off."""
+    enabled = False
+
+    def span(self, name):
+        return NULL_SPAN
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+
+class UploadMetrics:
+    """Seconds per span and counters for one upload. Repeated spans add up."""
+    enabled = True
+
+    def __init__(self):
+        self.timestamp = time.time()
+        self.seconds = {}
+        self.counters = {}
+
+    def span(self, name):
+        return Span(self, name)
+
+    def add_time(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        return {
+            "timestamp": round(self.timestamp, 3),
+            "seconds": {name: round(seconds, 6) for name, seconds in self.seconds.items()},
+            "counters": dict(self.counters),
+        }
+
+    def to_prometheus(self):
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_seconds Seconds spent in each step of the last upload.",
+            f"# TYPE {PROMETHEUS_PREFIX}_seconds gauge",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_seconds{{span="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(self.seconds.items())]
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_total Counters of the last upload.",
+            f"# TYPE {PROMETHEUS_PREFIX}_total gauge",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_total{{counter="{name}"}} {value}'
+                  for name, value in sorted(self.counters.items())]
+        lines.append(f"{PROMETHEUS_PREFIX}_timestamp_seconds {self.timestamp:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+NULL_METRICS = NullMetrics()
+current = NULL_METRICS
+
+
+def enable(log="metrics.log", prometheus="metrics.prom"):
+    global enabled, log_path, prometheus_path
+    enabled = True
+    log_path = log
+    prometheus_path = prometheus
+
+
+def profile_next_upload(path="upload.prof"):
+    global profile_path
+    profile_path = path
+
+
+def export(upload_metrics):
+    try:
+        if log_path:
+            with open(log_path, 'a') as file:
+                file.write(json.dumps(upload_metrics.to_dict()) + "\n")
+        if prometheus_path:
+            atomic_write_text(prometheus_path, upload_metrics.to_prometheus())
+    except OSError as e:
+        print(f"Error writing upload metrics: {e}")
+
+
+@contextmanager
+def upload():
+    """Collect metrics (and maybe a profile) for the upload run inside the block."""
+    global current, profile_path
+    if not enabled and not profile_path:
+        yield NULL_METRICS
+        return
+
+    current = UploadMetrics()
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        path, profile_path = profile_path, None
+        profiler.enable()
+
+    upload_metrics = current
+    start = time.perf_counter()
+    try:
+        yield upload_metrics
+    finally:
+        upload_metrics.add_time("total", time.perf_counter() - start)
+        current = NULL_METRICS
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(path)
+            print(f"Upload profile written to {path}")
+        if enabled:
+            export(upload_metrics)
@@ -1,49 +1,334 @@
-from rapidfuzz import process
+from array import array
+from datetime import MAXYEAR, MINYEAR
+from itertools import count
+from atomic_file import atomic_write_json
 import json
+import metrics
 
-with open('categories.json', 'r') as file:
-    category_data = json.load(file)
+category_data = None
+categorizer = None
+# Source of YearData.version values, unique across instances so a cache key
+# never matches a year object that has since been replaced
+data_versions = count(1)
+# Category used for merchants left for later review instead of asking
+UNREVIEWED_CATEGORY = "Other"
+# Account of statements imported without naming one, and of all older data
+DEFAULT_ACCOUNT = ""
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June",
+               "July", "August", "September", "October", "November", "December"]
+MONTH_INDEXES = {name: index for index, name in enumerate(MONTH_NAMES)}
+
+
+def get_category_data():
+    global category_data
+    if category_data is None:
+        with open('categories.json', 'r') as file:
+            category_data = json.load(file)
+    return category_data
+
+
+def get_categorizer():
+    # Imported here so rapidfuzz is only loaded once something needs categorizing
+    global categorizer
+    if categorizer is None:
+        from categorizer import Categorizer
+        categorizer = Categorizer(get_category_data()["merchants"])
+    return categorizer
 
 class Purchase:
+    """One purchase. Month, day and cents are parsed once when it is created;
+    date and amount are still readable in their original form."""
+    __slots__ = ('month', 'day', 'cents', 'label', 'category')
+
     def __init__(self, date, label, amount):
-        self.date = date
+        self.month, self.day = parse_date(date)
         self.label = label
-        self.amount = amount
+        self.cents = to_cents(amount)
         self.category = "Other"
 
+    @classmethod
+    def from_parts(cls, month, day, cents, label):
+        purchase = cls.__new__(cls)
+        purchase.month, purchase.day, purchase.cents = month, day, cents
+        purchase.label = label
+        purchase.category = "Other"
+        return purchase
+
+    @property
+    def date(self):
+        return format_date(self.month, self.day)
+
+    @property
+    def amount(self):
+        return self.cents / 100
 
     def set_category(self, ask_user_callback):
-        categories = category_data["categories"]
-        merchants_categories = category_data["merchants"]
+        with metrics.current.span("set_category"):
+            self.category = resolve_categories([self.label], ask_user_callback)[self.label]
+            save_categories()
 
-        desc = self.label.lower()
 
-        best_match, score, _ =  process.extractOne(desc, merchants_categories.keys())
-        
-        if best_match and score >= 75:
-            self.category = merchants_categories[best_match]
-        else:
-            self.category = ask_user_callback(self.label, categories)
+def resolve_categories(labels, ask_user_callback):
+    """Categorize labels, asking the user once per group of similar unknown merchants.
+
+    New merchants are only recorded in memory; call save_categories once the
+    upload is done. If ask_user_callback returns None the group is counted as
+    UNREVIEWED_CATEGORY and the merchants are not remembered.
+    """
+    categorizer = get_categorizer()
+    label_categories = categorizer.match_many(labels)
+    unresolved = [label for label, category in label_categories.items() if category is None]
+
+    for group in categorizer.group_labels(unresolved):
+        # An answer for an earlier group may already cover this one
+        category = categorizer.match(group[0])
+        if category is None:
+            category = ask_user_callback(group[0], get_category_data()["categories"])
+        if category is None:
+            for label in group:
+                label_categories[label] = UNREVIEWED_CATEGORY
+            continue
+        for label in group:
+            categorizer.add_merchant(label, category)
+            label_categories[label] = category
+
+    return label_categories
+
 
-            merchants_categories[desc] = self.category
-            try:
-                with open('categories.json', 'w') as file:
-                    json.dump(category_data, file, indent=4)
-            except Exception as e:
-                print (f"Error updating categories.json: {e}")
+def save_categories():
+    if categorizer is None or not categorizer.dirty:
+        return
+    try:
+        atomic_write_json('categories.json', category_data)
+        categorizer.dirty = False
+    except Exception as e:
+        print (f"Error updating categories.json: {e}")
 
 
 class Deposit:
+    __slots__ = ('month', 'day', 'cents')
+
     def __init__(self, date, amount):
-        self.date = date
-        self.amount = amount
+        self.month, self.day = parse_date(date)
+        self.cents = to_cents(amount)
+
+    @classmethod
+    def from_parts(cls, month, day, cents):
+        deposit = cls.__new__(cls)
+        deposit.month, deposit.day, deposit.cents = month, day, cents
+        return deposit
+
+    @property
+    def date(self):
+        return format_date(self.month, self.day)
+
+    @property
+    def amount(self):
+        return self.cents / 100
+
+
+def to_cents(amount):
+    return round(amount * 100)
+
+
+def parse_date(date):
+    """Split "MM/DD" into (month, day). The parser's "00/00" for a missing date gives (0, 0)."""
+    month, day = date.split('/')
+    return int(month), int(day)
+
+
+def format_date(month, day):
+    return f"{month:02d}/{day:02d}"
+
+
+def month_index(month):
+    # Month 0 (no date on the line) is counted as December, index -1
+    return month - 1
+
+
+class TransactionBatch:
+    """The transactions of one statement as parallel arrays.
+
+    Row i is row_months[i], row_days[i], row_cents[i] and row_labels[i], an
+    index into label_ids (-1 for a deposit). Parsers append rows directly
+    and totals and categories are computed from the columns, so no object
+    is created per transaction. purchases() and deposits() give the rows as
+    Purchase and Deposit objects for code that wants them.
+    """
+    def __init__(self, year=0, account=DEFAULT_ACCOUNT):
+        self.year = year
+        self.account = account
+        self.label_ids = {}
+        self.row_months = array('b')
+        self.row_days = array('b')
+        self.row_cents = array('q')
+        self.row_labels = array('i')
+
+    def __len__(self):
+        return len(self.row_cents)
+
+    @property
+    def transaction_count(self):
+        return len(self.row_cents)
+
+    def append(self, month, day, cents, label=None):
+        """Add one row; label None makes it a deposit."""
+        self.row_months.append(month)
+        self.row_days.append(day)
+        self.row_cents.append(cents)
+        if label is None:
+            self.row_labels.append(-1)
+        else:
+            label_ids = self.label_ids
+            label_id = label_ids.get(label)
+            if label_id is None:
+                label_id = label_ids[label] = len(label_ids)
+            self.row_labels.append(label_id)
+
+    def append_purchase(self, purchase):
+        self.append(purchase.month, purchase.day, purchase.cents, purchase.label)
+
+    def append_deposit(self, deposit):
+        self.append(deposit.month, deposit.day, deposit.cents)
+
+    def load_rows(self, labels, row_months, row_days, row_cents, row_labels):
+        """Replace the rows, e.g. with columns read back from the parse cache."""
+        self.label_ids = {label: i for i, label in enumerate(labels)}
+        self.row_months, self.row_days, self.row_cents, self.row_labels = row_months, row_days, row_cents, row_labels
+
+    def label_list(self):
+        """Labels in label id order."""
+        return list(self.label_ids)
+
+    def labels(self):
+        """Sorted labels that still have at least one row."""
+        labels = self.label_list()
+        return sorted({labels[label_id] for label_id in set(self.row_labels) if label_id >= 0})
+
+    def purchases(self):
+        labels = self.label_list()
+        return [Purchase.from_parts(month, day, cents, labels[label_id])
+                for month, day, cents, label_id in zip(self.row_months, self.row_days, self.row_cents, self.row_labels)
+                if label_id >= 0]
+
+    def deposits(self):
+        return [Deposit.from_parts(month, day, cents)
+                for month, day, cents, label_id in zip(self.row_months, self.row_days, self.row_cents, self.row_labels)
+                if label_id < 0]
+
+    def has_valid_dates(self):
+        """Whether every row can be given a date: a year date() accepts and a month 0-12.
+
+        Month 0 ("00/00") counts as December; year 0 means the statement had
+        no fee period line.
+        """
+        if not len(self):
+            return True
+        return MINYEAR <= self.year <= MAXYEAR and all(0 <= month <= 12 for month in self.row_months)
+
+    def label_totals(self):
+        """Cents per (month index, label id) and earned cents per month, in one pass over the rows."""
+        spent = {}
+        earned = [0] * 12
+        for month, cents, label_id in zip(self.row_months, self.row_cents, self.row_labels):
+            if label_id < 0:
+                earned[month_index(month)] += cents
+            else:
+                key = (month_index(month), label_id)
+                spent[key] = spent.get(key, 0) + cents
+        return spent, earned
+
+    def categorize(self, ask_user_callback):
+        return resolve_categories(self.labels(), ask_user_callback)
+
+    def to_delta(self, label_categories):
+        labels = self.label_list()
+        spent, earned = self.label_totals()
+        delta = AggregateDelta(self.year, self.account)
+        for (index, label_id), cents in spent.items():
+            delta.add_spent(index, label_categories[labels[label_id]], cents)
+        delta.earned = earned
+        return delta
+
+
+class StatementSummary(TransactionBatch):
+    """The transactions of one statement plus what it cost to read them.
+
+    Only the raw rows are kept, as a TransactionBatch, so memory depends on
+    statement length in bytes per row rather than objects per row. Totals
+    are computed from the rows when the summary is turned into a delta.
+    """
+    def __init__(self):
+        super().__init__()
+        self.page_count = 0
+        self.line_count = 0
+        self.extract_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.parser_name = None
+        self.parser_version = None
+
+    def select_rows(self, keep):
+        """A copy of the summary holding only the rows where keep is true."""
+        summary = StatementSummary()
+        summary.year = self.year
+        summary.account = self.account
+        summary.page_count = self.page_count
+        summary.line_count = self.line_count
+        summary.parser_name = self.parser_name
+        summary.parser_version = self.parser_version
+        summary.extract_seconds = self.extract_seconds
+        summary.parse_seconds = self.parse_seconds
+        columns = [array(column.typecode, (value for value, kept in zip(column, keep) if kept))
+                   for column in (self.row_months, self.row_days, self.row_cents, self.row_labels)]
+        summary.load_rows(self.label_list(), *columns)
+        return summary
+
+    def dated_rows(self):
+        """The summary without rows whose month is above 12, and how many were dropped."""
+        keep = [0 <= month <= 12 for month in self.row_months]
+        dropped = len(keep) - sum(keep)
+        return (self.select_rows(keep) if dropped else self), dropped
+
+
+class AggregateDelta:
+    """Change in per-month, per-category totals (in cents) for one account-year.
+
+    Applying a delta to AllData costs O(months x categories touched), and
+    applying it with sign=-1 reverts it, so a statement can be removed or
+    re-categorized without recomputing anything else.
+    """
+    def __init__(self, year, account=DEFAULT_ACCOUNT):
+        self.year = year
+        self.account = account
+        self.spent = [{} for _ in range(12)]
+        self.earned = [0] * 12
+
+    def add_spent(self, index, category, cents):
+        categories = self.spent[index]
+        categories[category] = categories.get(category, 0) + cents
+
+    def is_empty(self):
+        return not any(self.earned) and not any(any(month.values()) for month in self.spent)
+
 
 class MonthData:
     def __init__(self, month):
         self.month = month
-        self.total_spent = 0.0
-        self.total_earned = 0.0
-        self.categories = {cat: 0.0 for cat in category_data["categories"]}
+        self.spent_cents = 0
+        self.earned_cents = 0
+        self.category_cents = {cat: 0 for cat in get_category_data()["categories"]}
+
+    @property
+    def total_spent(self):
+        return self.spent_cents / 100
+
+    @property
+    def total_earned(self):
+        return self.earned_cents / 100
+
+    @property
+    def categories(self):
+        return {cat: cents / 100 for cat, cents in self.category_cents.items()}
 
     def to_dict(self):
         return {
@@ -55,47 +340,75 @@ class MonthData:
 
     def load_dict(self, data):
         self.month = (data["month"])
-        self.total_spent = data["total_spent"]
-        self.total_earned = data["total_earned"]
-        self.categories = data["categories"]
+        self.spent_cents = to_cents(data["total_spent"])
+        self.earned_cents = to_cents(data["total_earned"])
+        self.category_cents = {cat: to_cents(amount) for cat, amount in data["categories"].items()}
+
+    def add_spent(self, category, cents):
+        self.spent_cents += cents
+        self.category_cents[category] = self.category_cents.get(category, 0) + cents
 
     def add_purchase(self, purchase):
-        self.total_spent += purchase.amount
-        print("Here")
-        self.categories[purchase.category] += purchase.amount
-        self.clean_data()
+        self.add_spent(purchase.category, purchase.cents)
 
     def add_deposit(self, deposit):
-        self.total_earned += deposit.amount
-        self.clean_data()
-
-    def clean_data(self):
-        self.total_earned = int(self.total_earned * 100) / 100
-        self.total_spent = int(self.total_spent * 100) / 100
+        self.earned_cents += deposit.cents
 
     def data_exists(self):
-        return (self.total_earned != 0 or self.total_spent != 0)
+        return (self.earned_cents != 0 or self.spent_cents != 0)
     
     
 class YearData:
-    def __init__(self, year):
+    """Running totals for one year of one account, kept in integer cents.
+
+    Every purchase or deposit updates the month, category and year sums in
+    O(1). Averages are derived on read from the number of months with data.
+    """
+    def __init__(self, year, account=DEFAULT_ACCOUNT):
         self.year = year
-        self.total_spent = 0.0
-        self.total_earned = 0.0
-        self.average_spending = 0.0
-        self.average_earning = 0.0
+        self.account = account
+        self.spent_cents = 0
+        self.earned_cents = 0
+        self.active_months = 0
         self.months = []
-        self.categories= {cat: 0.0 for cat in category_data["categories"]}
+        self.category_cents = {cat: 0 for cat in get_category_data()["categories"]}
+        self.dirty_months = set()
+        self.version = next(data_versions)
         self.init_months()
 
     def init_months(self):
-        months = ["January", "February", "March", "April", "May", "June", 
-              "July", "August", "September", "October", "November", "December"]
-        
-        self.months = [MonthData(month) for month in months]
-    
+        self.months = [MonthData(month) for month in MONTH_NAMES]
+
+    def month(self, name):
+        return self.months[MONTH_INDEXES[name]]
+
+    @property
+    def total_spent(self):
+        return self.spent_cents / 100
+
+    @property
+    def total_earned(self):
+        return self.earned_cents / 100
+
+    @property
+    def average_spending(self):
+        if not self.active_months:
+            return 0.0
+        return (self.spent_cents // self.active_months) / 100
+
+    @property
+    def average_earning(self):
+        if not self.active_months:
+            return 0.0
+        return (self.earned_cents // self.active_months) / 100
+
+    @property
+    def categories(self):
+        return {cat: cents / 100 for cat, cents in self.category_cents.items()}
+
     def to_dict(self):
         return {
+            "account": self.account,
             "year": self.year,
             "total_spent": self.total_spent,
             "total_earned": self.total_earned,
@@ -107,88 +420,141 @@ class YearData:
     
     def load_dict(self, data):
         self.year = (data["year"])
-        self.total_spent = data["total_spent"]
-        self.total_earned = data["total_earned"]
-        self.average_earning = data["average_earning"]
-        self.average_spending = data["average_spending"]
-        self.categories = data["categories"]
+        self.account = data.get("account", DEFAULT_ACCOUNT)
+        self.category_cents = {cat: to_cents(amount) for cat, amount in data["categories"].items()}
 
         index = 0
         for month in data["months"]:
             self.months[index].load_dict(month)
             index += 1
+        self.recount()
+
+    def recount(self):
+        # Totals are re-derived from the months so they can never disagree
+        self.version = next(data_versions)
+        self.spent_cents = sum(month.spent_cents for month in self.months)
+        self.earned_cents = sum(month.earned_cents for month in self.months)
+        self.active_months = sum(1 for month in self.months if month.data_exists())
+
+    def add_spent(self, index, category, cents):
+        month = self.months[index]
+        was_active = month.data_exists()
+        month.add_spent(category, cents)
+        self.spent_cents += cents
+        self.category_cents[category] = self.category_cents.get(category, 0) + cents
+        self.active_months += month.data_exists() - was_active
+        self.dirty_months.add(index)
+        self.version = next(data_versions)
+
+    def add_earned(self, index, cents):
+        month = self.months[index]
+        was_active = month.data_exists()
+        month.earned_cents += cents
+        self.earned_cents += cents
+        self.active_months += month.data_exists() - was_active
+        self.dirty_months.add(index)
+        self.version = next(data_versions)
 
     def add_purchases(self, purchases, ask_user_callback):
-        print(self.categories)
+        label_categories = resolve_categories([purchase.label for purchase in purchases], ask_user_callback)
         for purchase in purchases:
-            purchase.set_category(ask_user_callback)
-            self.categories[purchase.category] += purchase.amount
-            index = int(purchase.date.split('/')[0]) - 1
-            
-            self.months[index].add_purchase(purchase)
-        
-        self.average_spending = 0.0
-        valid_months = 0
-
-        for month in self.months:
-            if month.data_exists():
-                self.average_spending += month.total_spent
-                valid_months += 1
-        self.total_spent = self.average_spending
-        self.average_spending /= valid_months
-        self.clean_data()
-        
+            purchase.category = label_categories[purchase.label]
+            self.add_spent(month_index(purchase.month), purchase.category, purchase.cents)
+
     def add_deposits(self, deposits):
         for deposit in deposits:
-            index = int(deposit.date.split('/')[0]) - 1
-            self.months[index].add_deposit(deposit)
-
-        self.average_earning = 0
-        valid_months = 0
-        
-        for month in self.months:
-            if month.data_exists():
-                self.average_earning += month.total_earned
-                valid_months += 1
-        self.total_earned = self.average_earning
-        self.average_earning /= valid_months
-        self.clean_data()
-
-    def clean_data(self):
-        self.total_earned = int(self.total_earned * 100) / 100
-        self.total_spent = int(self.total_spent * 100) / 100
-        self.average_earning = int(self.average_earning * 100) / 100
-        self.average_spending = int(self.average_spending * 100) / 100
+            self.add_earned(month_index(deposit.month), deposit.cents)
+
+    def apply_delta(self, delta, sign=1):
+        for index in range(12):
+            for category, cents in delta.spent[index].items():
+                if cents:
+                    self.add_spent(index, category, sign * cents)
+            if delta.earned[index]:
+                self.add_earned(index, sign * delta.earned[index])
+
+    def revert_delta(self, delta):
+        self.apply_delta(delta, sign=-1)
+
 
 class AllData:
+    """Totals of every account and year, indexed by (account, year).
+
+    Each account-year is a partition holding one YearData. A storage
+    backend can register partitions without loading them; get_year loads a
+    registered partition through loader(account, year) the first time it is
+    asked for, so startup time and memory follow what the dashboard shows
+    rather than the length of the history.
+    """
     def __init__(self):
-        self.years = []
+        self.partitions = {}  # (account, year) -> YearData, or None until loaded
+        self.loader = None
+        # Sequence number of the last ingest journal record in these totals
+        self.journal_seq = 0
+
+    @property
+    def years(self):
+        """The loaded YearData of every account, by account and year."""
+        return [self.partitions[key] for key in sorted(self.partitions) if self.partitions[key] is not None]
+
+    @years.setter
+    def years(self, year_list):
+        self.partitions = {(year_data.account, year_data.year): year_data for year_data in year_list}
 
     def load_data(self, data):
         for item in data:
             year_data = YearData(item["year"])
             year_data.load_dict(item)
-            self.years.append(year_data)
-
-    def add_data(self, purchases, deposits, year, ask_user_callback):
-        for item in self.years:
-            if item.year == year:
-                item.add_purchases(purchases, ask_user_callback)
-                item.add_deposits(deposits)
-                return
-            
-        new_year = YearData(year)
-        new_year.add_purchases(purchases, ask_user_callback)
-        new_year.add_deposits(deposits)
-        self.years.append(new_year)
-    
-    def add_year(self, year):
-        self.years.append(YearData(year))
+            self.partitions[(year_data.account, year_data.year)] = year_data
+
+    def register(self, account, year):
+        """Record that account-year exists without loading it."""
+        self.partitions.setdefault((account, year), None)
+
+    def load_all(self):
+        for account, year in list(self.partitions):
+            self.get_year(year, account=account)
+
+    def get_year(self, year, create=False, account=DEFAULT_ACCOUNT):
+        key = (account, year)
+        year_data = self.partitions.get(key)
+        if year_data is None and key in self.partitions:
+            year_data = self.partitions[key] = self.loader(account, year)
+        if year_data is None and create:
+            year_data = self.partitions[key] = YearData(year, account)
+        return year_data
+
+    def add_data(self, purchases, deposits, year, ask_user_callback, account=DEFAULT_ACCOUNT):
+        year_data = self.get_year(year, create=True, account=account)
+        year_data.add_purchases(purchases, ask_user_callback)
+        year_data.add_deposits(deposits)
+
+    def add_batch(self, batch, ask_user_callback):
+        """Categorize and add a TransactionBatch (or StatementSummary); returns the label categories."""
+        label_categories = batch.categorize(ask_user_callback)
+        self.apply_delta(batch.to_delta(label_categories))
+        return label_categories
+
+    add_summary = add_batch
+
+    def apply_delta(self, delta, sign=1):
+        self.get_year(delta.year, create=True, account=delta.account).apply_delta(delta, sign)
+
+    def revert_delta(self, delta):
+        year_data = self.get_year(delta.year, account=delta.account)
+        if year_data is not None:
+            year_data.revert_delta(delta)
+
+    def add_year(self, year, account=DEFAULT_ACCOUNT):
+        self.partitions[(account, year)] = YearData(year, account)
 
     def save_data(self):
+        self.load_all()
         return [year.to_dict() for year in self.years]
-    
-    def get_years(self):
-        return [year.year for year in self.years]
 
-   
\ No newline at end of file
+    def get_years(self, account=None):
+        """Years with data for account, or for any account when account is None."""
+        return sorted({year for year_account, year in self.partitions if account is None or year_account == account})
+
+    def get_accounts(self):
+        return sorted({account for account, _ in self.partitions})
@@ -0,0 +1,154 @@
+"""Fast text extraction for statement pages.
+
+Most of the time pdfplumber spends on a page goes into turning every
+character into a dict of two dozen attributes before extract_text groups
+them into lines. This module runs pdfminer's interpreter with a device that
+keeps only (top, bottom, x0, x1, text) per character and joins those tuples
+into lines the same way extract_text does with its default tolerances.
+
+Pages with characters it cannot decode or with rotated or vertical text
+raise FallbackToPdfplumber, and extract_page_text then uses pdfplumber.
+"""
+from pdfminer.pdfdevice import PDFDevice, PDFTextDevice
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.utils import apply_matrix_rect
+from pdfplumber.utils.text import LIGATURES
+
+# pdfplumber's extract_text defaults
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+class FallbackToPdfplumber(Exception):
+    pass
+
+
+class TextProbe(PDFDevice):
+    """Collects the decoded strings a page draws, without positions."""
+
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        self.parts = []
+        self.undecodable = False
+
+    def render_string(self, textstate, seq, ncs, graphicstate):
+        font = textstate.font
+        for obj in seq:
+            if isinstance(obj, bytes):
+                for cid in font.decode(obj):
+                    try:
+                        self.parts.append(font.to_unichr(cid))
+                    except PDFUnicodeNotDefined:
+                        self.undecodable = True
+
+
+class CharCollector(PDFTextDevice):
+    """Collects (y0, y1, x0, x1, text) for each character, as pdfminer would place it."""
+
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        self.chars = []
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+        if font.is_vertical():
+            raise FallbackToPdfplumber("vertical text")
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            raise FallbackToPdfplumber(f"no unicode for cid {cid}")
+
+        # Same box as pdfminer's LTChar
+        advance = font.char_width(cid) * fontsize * scaling
+        descent = font.get_descent() * fontsize
+        a, b, c, d, e, f = matrix
+        if not (a * d * scaling > 0 and b * c <= 0):
+            raise FallbackToPdfplumber("rotated text")
+        if b == 0 and c == 0 and a > 0:
+            # Plain scale and translate, the usual case
+            bottom = descent + rise
+            self.chars.append((d * bottom + f, d * (bottom + fontsize) + f, e, a * advance + e, text))
+            return advance
+        x0, y0, x1, y1 = apply_matrix_rect(matrix, (0, descent + rise, advance, descent + rise + fontsize))
+        self.chars.append((min(y0, y1), max(y0, y1), min(x0, x1), max(x0, x1), text))
+        return advance
+
+
+def interpret(page, device):
+    interpreter = PDFPageInterpreter(page.pdf.rsrcmgr, device)
+    interpreter.process_page(page.page_obj)
+    return device
+
+
+def probe_page(page):
+    """Return (text, undecodable): everything page draws, joined, and whether some of it had no unicode."""
+    probe = interpret(page, TextProbe(page.pdf.rsrcmgr))
+    return "".join(probe.parts), probe.undecodable
+
+
+def page_chars(page, region=None):
+    """(top, bottom, x0, x1, text) tuples in pdfplumber's page coordinates, optionally only those in region."""
+    collector = interpret(page, CharCollector(page.pdf.rsrcmgr))
+    mediabox_x0, mediabox_top = page.mediabox[:2]
+    height = page.height
+    chars = [(height - y1 + mediabox_top, height - y0 + mediabox_top, x0 + mediabox_x0, x1 + mediabox_x0, text)
+             for y0, y1, x0, x1, text in collector.chars]
+    if region is not None:
+        left, top, right, bottom = region
+        chars = [char for char in chars
+                 if char[3] > left and char[2] < right and char[1] > top and char[0] < bottom]
+    return chars
+
+
+def cluster_tops(chars):
+    """Map each top to a line number, chaining tops less than Y_TOLERANCE apart like pdfplumber."""
+    lines = {}
+    line = -1
+    last = None
+    for top in sorted({char[0] for char in chars}):
+        if last is None or top > last + Y_TOLERANCE:
+            line += 1
+        lines[top] = line
+        last = top
+    return lines
+
+
+def chars_to_lines(chars):
+    """Join character tuples into text lines, splitting words where extract_text would."""
+    lines_by_top = cluster_tops(chars)
+    lines = {}
+    for char in chars:
+        lines.setdefault(lines_by_top[char[0]], []).append(char)
+
+    text_lines = []
+    for number in sorted(lines):
+        words = []
+        word = []
+        previous = None
+        for char in sorted(lines[number], key=lambda char: (char[2], char[3])):
+            text = char[4]
+            if text.isspace():
+                if word:
+                    words.append("".join(word))
+                word = []
+                previous = None
+                continue
+            if previous is not None and (char[2] < previous[2] or char[2] > previous[3] + X_TOLERANCE
+                                         or abs(char[0] - previous[0]) > Y_TOLERANCE):
+                words.append("".join(word))
+                word = []
+            word.append(LIGATURES.get(text, text))
+            previous = char
+        if word:
+            words.append("".join(word))
+        if words:
+            text_lines.append(" ".join(words))
+    return "\n".join(text_lines)
+
+
+def extract_page_text(page, region=None):
+    """Text of page (a pdfplumber page), cropped to region if given."""
+    try:
+        return chars_to_lines(page_chars(page, region))
+    except FallbackToPdfplumber:
+        return (page.crop(region) if region else page).extract_text() or ""
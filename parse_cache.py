@@ -0,0 +1,129 @@
+import os
+import struct
+import time
+import zlib
+from array import array
+
+import statement_parser
+from atomic_file import atomic_write_bytes
+from objects import StatementSummary
+
+MAGIC = b"FTPC"
+FORMAT_VERSION = 1
+# magic, format version, parser version, year, pages, lines, rows, labels, parser name length
+HEADER = struct.Struct("<4sHIiIIIIB")
+ROW_ARRAYS = ["row_months", "row_days", "row_cents", "row_labels"]
+
+
+def encode_summary(summary):
+    """Pack a StatementSummary's raw rows into a small zlib-compressed blob."""
+    labels = sorted(summary.label_ids, key=summary.label_ids.get)
+    name = summary.parser_name.encode()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, summary.parser_version, summary.year, summary.page_count,
+                         summary.line_count, len(summary.row_cents), len(labels), len(name))
+    body = b"".join(getattr(summary, column).tobytes() for column in ROW_ARRAYS)
+    body += "\n".join(labels).encode()
+    return header + name + zlib.compress(body)
+
+
+def decode_summary(data):
+    magic, format_version, parser_version, year, pages, lines, rows, label_count, name_length = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError("Not a parse cache entry")
+    offset = HEADER.size
+    name = data[offset:offset + name_length].decode()
+    body = zlib.decompress(data[offset + name_length:])
+
+    columns = []
+    position = 0
+    for typecode in ('b', 'b', 'q', 'i'):
+        column = array(typecode)
+        size = rows * column.itemsize
+        column.frombytes(body[position:position + size])
+        columns.append(column)
+        position += size
+    labels = body[position:].decode().split("\n") if label_count else []
+
+    summary = StatementSummary()
+    summary.year = year
+    summary.page_count = pages
+    summary.line_count = lines
+    summary.parser_name = name
+    summary.parser_version = parser_version
+    summary.load_rows(labels, *columns)
+    return summary
+
+
+class ParseCache:
+    """Parsed statements keyed by file hash, so a PDF is only run through pdfplumber once.
+
+    Each entry is one <hash>.bin file holding the summary's raw rows and the
+    name and version of the parser that produced them. Entries from an older
+    parser version are ignored and removed. A hit touches the file, and
+    evict() drops entries unused for max_age_days, then the least recently
+    used ones until the cache fits in max_bytes.
+    """
+
+    def __init__(self, directory="parse_cache", max_bytes=64 * 2**20, max_age_days=365):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, file_hash):
+        return os.path.join(self.directory, file_hash + ".bin")
+
+    def get(self, file_hash):
+        path = self.entry_path(file_hash)
+        try:
+            with open(path, 'rb') as file:
+                summary = decode_summary(file.read())
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (ValueError, struct.error, zlib.error) as e:
+            print(f"Dropping unreadable parse cache entry {path}: {e}")
+            self.remove(path)
+            self.misses += 1
+            return None
+
+        parser = statement_parser.parsers.get(summary.parser_name)
+        if parser is None or parser.version != summary.parser_version:
+            self.remove(path)
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return summary
+
+    def put(self, file_hash, summary):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        atomic_write_bytes(self.entry_path(file_hash), encode_summary(summary))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        if not os.path.exists(self.directory):
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        oldest_allowed = time.time() - self.max_age_days * 86400
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if mtime >= oldest_allowed and total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
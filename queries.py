@@ -0,0 +1,182 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from transaction_store import DEPOSIT, EPOCH_ORDINAL, to_days
+
+
+def add_months(day, months):
+    """The same day of the month months later (or earlier), clamped to the month's end."""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date.fromordinal(to_days(month_index // 12, month_index % 12 + 1, day.day) + EPOCH_ORDINAL)
+
+
+class QueryEngine:
+    """Date-range totals over the transaction store in O(1) per category.
+
+    Keeps one row of running sums (in cents) per day from the first to the
+    last transaction: spent[i, c] is everything spent in category c before
+    day first_day + i, so any range is one subtraction. Ranges can span any
+    number of years. refresh() folds in rows added to the store since the
+    last call and only recomputes the sums from the earliest day they touch.
+    With an account, only that account's statements are counted; without
+    one, every account is.
+    """
+
+    def __init__(self, store, account=None):
+        self.store = store
+        self.account = account
+        self.rows = 0
+        self.first_day = 0
+        self.spent = np.zeros((1, 0), dtype=np.int64)
+        self.earned = np.zeros(1, dtype=np.int64)
+
+    @property
+    def day_count(self):
+        return len(self.earned) - 1
+
+    @property
+    def categories(self):
+        return self.store.categories[:self.spent.shape[1]]
+
+    def first_date(self):
+        return date.fromordinal(self.first_day + EPOCH_ORDINAL) if self.day_count else None
+
+    def last_date(self):
+        return date.fromordinal(self.first_day + self.day_count - 1 + EPOCH_ORDINAL) if self.day_count else None
+
+    def refresh(self):
+        """Add the store's new rows to the running sums."""
+        total = len(self.store)
+        if total == self.rows:
+            return
+        days = self.store.column("date")[self.rows:total].astype(np.int64)
+        amounts = self.store.column("amount")[self.rows:total].astype(np.int64)
+        categories = self.store.column("category")[self.rows:total].astype(np.int64)
+        if self.account is not None:
+            in_account = np.array([account == self.account for account in self.store.source_accounts], dtype=bool)
+            rows = in_account[self.store.column("source")[self.rows:total]]
+            days, amounts, categories = days[rows], amounts[rows], categories[rows]
+        self.rows = total
+        if not len(days):
+            return
+
+        self.cover(int(days.min()), int(days.max()), len(self.store.categories))
+        offsets = days - self.first_day
+        start = int(offsets.min())
+        span = self.day_count - start
+
+        # Per-day changes from the earliest touched day on, then their running sum
+        is_deposit = categories == DEPOSIT
+        earned = np.zeros(span, dtype=np.int64)
+        np.add.at(earned, offsets[is_deposit] - start, amounts[is_deposit])
+        spent = np.zeros((span, self.spent.shape[1]), dtype=np.int64)
+        np.add.at(spent, (offsets[~is_deposit] - start, categories[~is_deposit]), amounts[~is_deposit])
+        self.earned[start + 1:] += np.cumsum(earned)
+        self.spent[start + 1:] += np.cumsum(spent, axis=0)
+
+    def cover(self, first_day, last_day, category_count):
+        """Grow the sums so they cover first_day..last_day and category_count categories."""
+        if not self.day_count:
+            self.first_day = first_day
+            self.spent = np.zeros((last_day - first_day + 2, category_count), dtype=np.int64)
+            self.earned = np.zeros(last_day - first_day + 2, dtype=np.int64)
+            return
+
+        before = max(0, self.first_day - first_day)
+        after = max(0, last_day - (self.first_day + self.day_count - 1))
+        extra_categories = max(0, category_count - self.spent.shape[1])
+        if before or after:
+            # Nothing happened before the old first day, and the totals stay
+            # flat after the old last day
+            self.earned = np.pad(self.earned, (before, after), mode='edge')
+            self.earned[:before] = 0
+            self.spent = np.pad(self.spent, ((before, after), (0, 0)), mode='edge')
+            self.spent[:before] = 0
+            self.first_day -= before
+        if extra_categories:
+            self.spent = np.pad(self.spent, ((0, 0), (0, extra_categories)))
+
+    def bounds(self, start, end):
+        """Row indexes of the sums for the inclusive date range, clipped to the data."""
+        first = start.toordinal() - EPOCH_ORDINAL - self.first_day
+        last = end.toordinal() - EPOCH_ORDINAL - self.first_day + 1
+        first = min(max(first, 0), self.day_count)
+        last = min(max(last, first), self.day_count)
+        return first, last
+
+    # ---------------- Queries ----------------
+    def spent_cents(self, start, end, category=None):
+        first, last = self.bounds(start, end)
+        if category is None:
+            return int(self.spent[last].sum() - self.spent[first].sum())
+        if category not in self.store.category_ids or self.store.category_ids[category] >= self.spent.shape[1]:
+            return 0
+        column = self.store.category_ids[category]
+        return int(self.spent[last, column] - self.spent[first, column])
+
+    def earned_cents(self, start, end):
+        first, last = self.bounds(start, end)
+        return int(self.earned[last] - self.earned[first])
+
+    def category_cents(self, start, end):
+        first, last = self.bounds(start, end)
+        totals = self.spent[last] - self.spent[first]
+        return {category: int(cents) for category, cents in zip(self.categories, totals)}
+
+    def range_totals(self, start, end):
+        """Spent, earned and per-category totals (as floats) for start..end inclusive."""
+        categories = self.category_cents(start, end)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "total_spent": sum(categories.values()) / 100,
+            "total_earned": self.earned_cents(start, end) / 100,
+            "categories": {category: cents / 100 for category, cents in categories.items()},
+        }
+
+    def last_days(self, days, end=None):
+        """Totals of the days-long window ending at end (default: the last day with data)."""
+        end = end or self.last_date()
+        if end is None:
+            return None
+        return self.range_totals(end - timedelta(days=days - 1), end)
+
+    def trailing_average(self, months=12, end=None):
+        """Average monthly spending and earning over the months-long window ending at end."""
+        end = end or self.last_date()
+        if end is None:
+            return None
+        start = add_months(end, -months) + timedelta(days=1)
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "average_spending": (self.spent_cents(start, end) // months) / 100,
+            "average_earning": (self.earned_cents(start, end) // months) / 100,
+        }
+
+    def month_range(self, year, month):
+        start = date(year, month, 1)
+        return start, add_months(start, 1) - timedelta(days=1)
+
+    def month_totals(self, year, month):
+        return self.range_totals(*self.month_range(year, month))
+
+    def year_totals(self, year):
+        """The same numbers YearData shows, computed from the raw rows."""
+        months = []
+        for month in range(1, 13):
+            start, end = self.month_range(year, month)
+            months.append((self.spent_cents(start, end), self.earned_cents(start, end)))
+        active = sum(1 for spent, earned in months if spent or earned)
+        spent = sum(spent for spent, _ in months)
+        earned = sum(earned for _, earned in months)
+        return {
+            "year": year,
+            "total_spent": spent / 100,
+            "total_earned": earned / 100,
+            "average_spending": (spent // active) / 100 if active else 0.0,
+            "average_earning": (earned // active) / 100 if active else 0.0,
+            "categories": {category: cents / 100 for category, cents in
+                           self.category_cents(date(year, 1, 1), date(year, 12, 31)).items()},
+        }
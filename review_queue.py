@@ -0,0 +1,48 @@
+import json
+import os
+import time
+
+from atomic_file import atomic_write_json
+from objects import get_categorizer, save_categories
+
+
+class ReviewQueue:
+    """Unknown merchants waiting for someone to pick a category.
+
+    Used as the ask_user_callback of headless imports: the label is queued in
+    review_queue.json and None is returned, so the import never blocks and the
+    purchases are counted as UNREVIEWED_CATEGORY in the meantime.
+    """
+
+    def __init__(self, path="review_queue.json"):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.entries = json.load(file)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __call__(self, label, categories):
+        entry = self.entries.setdefault(label, {"first_seen": time.strftime("%Y-%m-%d %H:%M:%S"), "count": 0})
+        entry["count"] += 1
+        self.dirty = True
+        return None
+
+    def resolve(self, label, category):
+        """Teach the categorizer label's category and drop it from the queue.
+
+        Only later imports use the new category; totals already counted as
+        UNREVIEWED_CATEGORY stay there.
+        """
+        get_categorizer().add_merchant(label, category)
+        save_categories()
+        if self.entries.pop(label, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            atomic_write_json(self.path, self.entries)
+            self.dirty = False
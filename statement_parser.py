@@ -0,0 +1,291 @@
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+
+PURCHASE = "purchase"
+DEPOSIT = "deposit"
+YEAR = "year"
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-zA-Z0-9\s]')
+LOCATION_PATTERN = re.compile(r'\b\d{1,5}\b.*')
+
+
+@lru_cache(maxsize=4096)
+def clean_label(label):
+    """Clean the purchase label to extract only the company name."""
+
+    # Remove non-alphanumeric characters (except spaces)
+    cleaned_label = NON_ALPHANUMERIC_PATTERN.sub('', label)
+
+    # Remove location information (e.g., "Starbucks 123 Main St")
+    cleaned_label = LOCATION_PATTERN.sub('', cleaned_label)
+
+    # Remove extra spaces
+    return ' '.join(cleaned_label.split())
+
+
+class UnsupportedStatement(Exception):
+    pass
+
+
+class StatementSample:
+    """What a detector may look at: the PDF metadata and the first page's text.
+
+    The first page is only extracted if a detector asks for it, and then only
+    once for all of them.
+    """
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.metadata = pdf.metadata or {}
+        self.text = None
+
+    def first_page_text(self):
+        if self.text is None:
+            self.text = ""
+            if self.pdf.pages:
+                from page_text import extract_page_text
+                page = self.pdf.pages[0]
+                self.text = extract_page_text(page)
+                page.close()
+        return self.text
+
+
+class StatementParser:
+    """Base class of the bank formats in the registry.
+
+    A format sets name, bumps version whenever its output changes, and
+    implements detect, is_statement_line and parse_line. select_pages and
+    table_region let it skip pages and page areas that never hold
+    transactions. With page_pattern set, pages whose drawn text does not
+    match it are skipped after a cheap probe; by default every page is
+    extracted in full.
+    """
+
+    name = None
+    version = 1
+    page_pattern = None
+
+    def detect(self, sample):
+        """Return True if sample (a StatementSample) is a statement of this bank."""
+        return False
+
+    def select_pages(self, pdf):
+        if self.page_pattern is None:
+            return pdf.pages
+        return (page for page in pdf.pages if self.may_have_transactions(page))
+
+    def may_have_transactions(self, page):
+        from page_text import probe_page
+        text, undecodable = probe_page(page)
+        # Text the probe could not decode might hold anything
+        return undecodable or bool(self.page_pattern.search(text))
+
+    def table_region(self, page):
+        """Bounding box (x0, top, x1, bottom) of the transactions on page, or None for the whole page."""
+        return None
+
+    def is_statement_line(self, line):
+        raise NotImplementedError
+
+    def parse_line(self, line):
+        raise NotImplementedError
+
+    def parse_lines(self, lines):
+        parse_line = self.parse_line
+        return [parse_line(line) for line in lines]
+
+    def parse_record(self, line):
+        """Like parse_line, with the date and amount as integers:
+
+            (kind, month, day, cents, value)
+
+        Formats can override this to skip the string date and float amount.
+        """
+        kind, date, amount, value = self.parse_line(line)
+        if kind == YEAR:
+            return (YEAR, 0, 0, 0, value)
+        month, day = date.split('/')
+        return (kind, int(month), int(day), round(amount * 100), value)
+
+    def parse_into(self, lines, batch):
+        """Append the transactions on lines to batch (a TransactionBatch) and set its year."""
+        parse_record = self.parse_record
+        append = batch.append
+        for line in lines:
+            kind, month, day, cents, value = parse_record(line)
+            if kind == PURCHASE:
+                append(month, day, cents, value)
+            elif kind == DEPOSIT:
+                append(month, day, cents)
+            elif value is not None:
+                batch.year = value
+        return batch
+
+
+# Registered formats by name; detectors are tried in registration order
+parsers = {}
+
+
+def register_parser(parser):
+    parsers[parser.name] = parser
+    return parser
+
+
+def get_parser(name):
+    if name not in parsers:
+        raise UnsupportedStatement(f"Unknown statement format: {name}")
+    return parsers[name]
+
+
+def detect_parser(pdf):
+    """Return the registered parser for an open pdfplumber PDF."""
+    sample = StatementSample(pdf)
+    for parser in parsers.values():
+        if parser.detect(sample):
+            return parser
+    raise UnsupportedStatement("Not a statement of any supported bank")
+
+
+def is_pdf_file(path):
+    with open(path, 'rb') as file:
+        return file.read(5) == b'%PDF-'
+
+
+@contextmanager
+def open_pdf(path):
+    """Open path with pdfplumber for a with block.
+
+    A file that doesn't start like a PDF is rejected from its first bytes,
+    and the errors pdfplumber and pdfminer raise for a corrupt or truncated
+    PDF, while opening it or reading its pages, become UnsupportedStatement.
+    """
+    if not is_pdf_file(path):
+        raise UnsupportedStatement("Not a PDF file")
+
+    import pdfplumber
+    from pdfminer.psparser import PSException
+    from pdfplumber.utils.exceptions import PdfminerException
+
+    try:
+        with pdfplumber.open(path) as pdf:
+            yield pdf
+    except (PdfminerException, PSException) as e:
+        raise UnsupportedStatement(f"Unreadable PDF: {e}")
+
+
+def sniff_file(path):
+    """Return the parser for the statement at path, or raise UnsupportedStatement.
+
+    Anything that is not a PDF is rejected from its first bytes; a PDF from an
+    unsupported bank costs at most its metadata and first page.
+    """
+    with open_pdf(path) as pdf:
+        return detect_parser(pdf)
+
+
+class WellsFargoParser(StatementParser):
+    """Line parser for Wells Fargo checking statements.
+
+    Every pattern is compiled once. A line is classified with a single
+    keyword search and its fields are pulled out in the same call, so
+    parse_line returns one record per line:
+
+        (PURCHASE, date, amount, label)
+        (DEPOSIT, date, amount, None)
+        (YEAR, None, None, year)     year is None if the fee period has no year
+    """
+
+    name = "wells_fargo"
+    version = 1
+
+    detect_pattern = re.compile(r'Wells Fargo|Fee period \d{2}/\d{2}/\d{4}', re.IGNORECASE)
+    # Transaction lines and the fee period line all carry a date
+    page_pattern = re.compile(r'\d{1,2}/\d{1,2}')
+    line_date_pattern = re.compile(r'^\d{1,2}/\d{1,2}')
+    line_year_pattern = re.compile(r'\d{2}/\d{2}/\d{4}')
+
+    keyword_pattern = re.compile(r'Purchase|Zelle to|Money Transfer|Withdraw|(Fee period)')
+    purchase_keyword_pattern = re.compile(r'Purchase|Zelle to|Money Transfer|Withdraw')
+    date_pattern = re.compile(r'(\d{1,2})/(\d{1,2})')
+    amount_pattern = re.compile(r'(\d+)\.(\d{2})')
+    label_anchor = 'authorized on '
+    label_pattern = re.compile(r'authorized on \d{1,2}/\d{1,2} (.*?) \d+\.\d{2}')
+    year_pattern = re.compile(r'Fee period \d{2}/\d{2}/(\d{4})')
+
+    def detect(self, sample):
+        if any("wells fargo" in str(value).lower() for value in sample.metadata.values()):
+            return True
+        return bool(self.detect_pattern.search(sample.first_page_text()))
+
+    def is_statement_line(self, line):
+        return bool(self.line_date_pattern.match(line) or self.line_year_pattern.search(line))
+
+    def classify(self, line):
+        keyword = self.keyword_pattern.search(line)
+        if keyword and keyword.group(1):
+            # A purchase keyword anywhere on the line wins over "Fee period"
+            if not self.purchase_keyword_pattern.search(line, keyword.end()):
+                return YEAR
+        elif not keyword:
+            return DEPOSIT
+        return PURCHASE
+
+    def parse_line(self, line):
+        kind = self.classify(line)
+        if kind == PURCHASE:
+            return self.parse_purchase(line)
+        if kind == DEPOSIT:
+            return self.parse_deposit(line)
+        return self.parse_year(line)
+
+    def parse_record(self, line):
+        kind = self.classify(line)
+        if kind == YEAR:
+            return (YEAR, 0, 0, 0, self.parse_year(line)[3])
+
+        date_match = self.date_pattern.match(line)
+        amount_match = self.amount_pattern.search(line)
+        month, day = (int(date_match.group(1)), int(date_match.group(2))) if date_match else (0, 0)
+        cents = int(amount_match.group(1)) * 100 + int(amount_match.group(2)) if amount_match else 0
+        if kind == DEPOSIT:
+            return (DEPOSIT, month, day, cents, None)
+
+        label_match = self.match_label(line)
+        return (PURCHASE, month, day, cents, clean_label(label_match.group(1) if label_match else "Zelle"))
+
+    def parse_purchase(self, line):
+        date_match = self.date_pattern.match(line)
+        amount_match = self.amount_pattern.search(line)
+        label_match = self.match_label(line)
+
+        date = date_match.group(0) if date_match else "00/00"
+        amount = float(amount_match.group(0)) if amount_match else 0.0
+        label = label_match.group(1) if label_match else "Zelle"
+        return (PURCHASE, date, amount, clean_label(label))
+
+    def match_label(self, line):
+        # Jump straight to each "authorized on" instead of trying the label
+        # pattern at every offset of the line.
+        position = line.find(self.label_anchor)
+        while position != -1:
+            match = self.label_pattern.match(line, position)
+            if match:
+                return match
+            position = line.find(self.label_anchor, position + 1)
+        return None
+
+    def parse_deposit(self, line):
+        date_match = self.date_pattern.match(line)
+        amount_match = self.amount_pattern.search(line)
+
+        date = date_match.group(0) if date_match else "00/00"
+        amount = float(amount_match.group(0)) if amount_match else 0.0
+        return (DEPOSIT, date, amount, None)
+
+    def parse_year(self, line):
+        match = self.year_pattern.search(line)
+        return (YEAR, None, None, int(match.group(1)) if match else None)
+
+
+default_parser = register_parser(WellsFargoParser())
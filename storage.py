@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+
+from atomic_file import atomic_write_json
+from objects import AllData, YearData
+
+# Every table is keyed by (account, year) first, so one partition is one index range
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS years (
+    account TEXT NOT NULL DEFAULT '',
+    year INTEGER NOT NULL,
+    PRIMARY KEY (account, year)
+);
+CREATE TABLE IF NOT EXISTS months (
+    account TEXT NOT NULL DEFAULT '',
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    spent_cents INTEGER NOT NULL,
+    earned_cents INTEGER NOT NULL,
+    PRIMARY KEY (account, year, month)
+);
+CREATE TABLE IF NOT EXISTS month_categories (
+    account TEXT NOT NULL DEFAULT '',
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    cents INTEGER NOT NULL,
+    PRIMARY KEY (account, year, month, category)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class JsonStorage:
+    """The original database.json format: the whole AllData tree in one file."""
+
+    def __init__(self, path="database.json"):
+        self.path = path
+
+    def exists(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as file:
+                return bool(json.load(file))
+        except (json.JSONDecodeError, FileNotFoundError):
+            return False
+
+    def load(self, user_data):
+        # One file holds every account-year, so there is nothing to load lazily
+        with open(self.path, 'r') as file:
+            user_data.load_data(json.load(file))
+
+    def save(self, user_data, full=False):
+        atomic_write_json(self.path, user_data.save_data())
+        for year_data in user_data.years:
+            year_data.dirty_months.clear()
+
+    def sync(self):
+        # atomic_write_json already fsyncs the file
+        pass
+
+
+class SqliteStorage:
+    """SQLite backend that only writes the months changed since the last save.
+
+    Amounts are stored in integer cents. Every save runs in a single
+    transaction, and WAL mode keeps readers unblocked while a save runs.
+    Each (account, year) is a partition: load() only registers them, and a
+    partition's months are read when the dashboard first asks for it. The
+    meta table records the last ingest journal record the totals include.
+    """
+
+    def __init__(self, path="database.sqlite"):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def exists(self):
+        return self.connection.execute("SELECT 1 FROM years LIMIT 1").fetchone() is not None
+
+    def load(self, user_data):
+        """Register every account-year with user_data; each is read on first use."""
+        for account, year in self.connection.execute("SELECT account, year FROM years ORDER BY account, year"):
+            user_data.register(account, year)
+        user_data.loader = self.load_partition
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'journal_seq'").fetchone()
+        user_data.journal_seq = row[0] if row else 0
+
+    def load_partition(self, account, year):
+        year_data = YearData(year, account)
+        for month, spent_cents, earned_cents in self.connection.execute(
+                "SELECT month, spent_cents, earned_cents FROM months WHERE account = ? AND year = ?",
+                (account, year)):
+            month_data = year_data.months[month - 1]
+            month_data.spent_cents = spent_cents
+            month_data.earned_cents = earned_cents
+
+        year_data.category_cents = dict.fromkeys(year_data.category_cents, 0)
+        for month, category, cents in self.connection.execute(
+                "SELECT month, category, cents FROM month_categories WHERE account = ? AND year = ?",
+                (account, year)):
+            year_data.months[month - 1].category_cents[category] = cents
+            year_data.category_cents[category] = year_data.category_cents.get(category, 0) + cents
+
+        year_data.recount()
+        return year_data
+
+    def save(self, user_data, full=False):
+        """Write the dirty months of every loaded account-year, or everything when full is set."""
+        if full:
+            user_data.load_all()
+        with self.connection:
+            if full:
+                self.connection.execute("DELETE FROM month_categories")
+                self.connection.execute("DELETE FROM months")
+                self.connection.execute("DELETE FROM years")
+
+            for year_data in user_data.years:
+                key = (year_data.account, year_data.year)
+                self.connection.execute("INSERT OR IGNORE INTO years (account, year) VALUES (?, ?)", key)
+                indexes = range(12) if full else sorted(year_data.dirty_months)
+                for index in indexes:
+                    month = year_data.months[index]
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO months (account, year, month, spent_cents, earned_cents) "
+                        "VALUES (?, ?, ?, ?, ?)", (*key, index + 1, month.spent_cents, month.earned_cents))
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO month_categories (account, year, month, category, cents) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(*key, index + 1, category, cents) for category, cents in month.category_cents.items()])
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('journal_seq', ?)",
+                                    (user_data.journal_seq,))
+
+        for year_data in user_data.years:
+            year_data.dirty_months.clear()
+
+    def sync(self):
+        """Make every committed save durable, e.g. before the journal it replaces is emptied."""
+        # With synchronous=NORMAL commits are not fsynced; a checkpoint syncs the WAL and the database
+        self.connection.execute("PRAGMA wal_checkpoint(FULL)")
+
+
+def migrate_json(json_path="database.json", storage=None):
+    """One-shot copy of a database.json history into SQLite."""
+    storage = storage or SqliteStorage()
+    user_data = AllData()
+    JsonStorage(json_path).load(user_data)
+    storage.save(user_data, full=True)
+    return storage
+
+
+def open_storage(path="database.sqlite", json_path="database.json"):
+    """Open the SQLite store, migrating an existing database.json into it the first time."""
+    storage = SqliteStorage(path)
+    if not storage.exists() and JsonStorage(json_path).exists():
+        print(f"Migrating {json_path} to {path}...")
+        migrate_json(json_path, storage)
+    return storage
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import synthetic
+from backend import reset_state
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """An empty data directory with a categories.json, as the working directory."""
+    synthetic.generate(str(tmp_path), statements=0)
+    monkeypatch.chdir(tmp_path)
+    reset_state()
+    yield tmp_path
+    reset_state()
+
+
+def answer_other(label, categories):
+    return "Other"
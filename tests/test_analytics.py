@@ -0,0 +1,22 @@
+import numpy as np
+
+from analytics import SpendingMatrix
+
+
+def matrix(categories, spent, earned=(0, 0), first_period=24288):
+    return SpendingMatrix(first_period, categories, np.array(spent, dtype=np.int64),
+                          np.array(earned, dtype=np.int64), False)
+
+
+def test_covers_compares_categories_by_name():
+    totals = matrix(["Food", "Bills"], [[100, 50], [0, 70]])
+    assert matrix(["Bills", "Other", "Food"], [[50, 0, 100], [70, 0, 0]]).covers(totals)
+    # Same totals, different split
+    assert not matrix(["Food", "Bills"], [[150, 0], [0, 70]]).covers(totals)
+    assert not matrix(["Food", "Bills", "Other"], [[100, 0, 50], [0, 70, 0]]).covers(totals)
+
+
+def test_covers_needs_every_period_of_other():
+    totals = matrix(["Food"], [[100], [40]])
+    assert matrix(["Food"], [[5], [100], [40]], earned=(0, 0, 0), first_period=24287).covers(totals)
+    assert not matrix(["Food"], [[100]], earned=(0,)).covers(totals)
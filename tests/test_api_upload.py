@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import synthetic
+
+
+def test_upload_changes_data_only_on_the_event_loop(workspace, monkeypatch):
+    import backend
+    from api_server import ApiServer
+    from review_queue import ReviewQueue
+    path = synthetic.generate(str(workspace / "statements"), statements=1, pages=1)[0]
+    with open(path, "rb") as file:
+        body = file.read()
+
+    monkeypatch.setattr(backend, "JOURNAL_COMPACT_RECORDS", 1)
+    compact_threads = []
+    compact_journal = backend.compact_journal
+
+    def recording_compact(user_data, force=False):
+        compact_threads.append(threading.get_ident())
+        return compact_journal(user_data, force)
+    monkeypatch.setattr(backend, "compact_journal", recording_compact)
+
+    async def upload():
+        server = ApiServer(backend.load_user_data(), ReviewQueue(str(workspace / "review_queue.json")))
+        http_server = await server.start(port=0)
+        http_server.close()
+        stats = await server.upload(body, {})
+        return server, stats, threading.get_ident()
+
+    server, stats, loop_thread = asyncio.run(upload())
+    assert stats["transactions"] == 49
+    assert compact_threads == [loop_thread]
+    assert backend.get_ingest_journal().count == 0
+    assert server.user_data.get_year(2024).spent_cents > 0
@@ -0,0 +1,23 @@
+import random
+
+import categorizer
+import synthetic
+from categorizer import Categorizer
+
+
+def test_group_labels_keeps_first_seen_order():
+    labels = ["Corner Store", "Main Deli", "corner store", "STORE CORNER", "Main Deli 2", "Fuel Stop"]
+    assert Categorizer({}).group_labels(labels) == [
+        ["Corner Store", "corner store", "STORE CORNER"], ["Main Deli", "Main Deli 2"], ["Fuel Stop"]]
+
+
+def test_group_labels_is_the_same_in_small_blocks(monkeypatch):
+    rng = random.Random(0)
+    merchants = synthetic.make_merchants(400, rng)
+    labels = merchants + [merchant + " 2" for merchant in merchants[:100]] + [m.upper() for m in merchants[:50]]
+    rng.shuffle(labels)
+    whole = Categorizer({}).group_labels(labels)
+
+    monkeypatch.setattr(categorizer, "MAX_MATRIX_CELLS", 5_000)
+    assert Categorizer({}).group_labels(labels) == whole
+    assert sorted(label for group in whole for label in group) == sorted(labels)
@@ -0,0 +1,31 @@
+import pytest
+
+import line_parser
+import statement_parser
+
+parser = statement_parser.default_parser
+
+
+@pytest.mark.parametrize("line", line_parser.EDGE_LINES)
+def test_edge_lines_match_the_original_path(line):
+    assert parser.parse_line(line) == line_parser.reference_line(line)
+    assert parser.parse_record(line) == line_parser.reference_record(line)
+
+
+def test_synthetic_lines_match_the_original_path():
+    lines = line_parser.statement_lines(5000)
+    assert line_parser.mismatches(lines) == []
+    assert parser.parse_lines(lines) == [line_parser.reference_line(line) for line in lines]
+
+
+def test_parse_into_matches_the_original_rows():
+    from objects import TransactionBatch
+    lines = line_parser.statement_lines(500)
+    batch = parser.parse_into(lines, TransactionBatch())
+
+    labels = batch.label_list()
+    rows = [(month, day, cents, labels[label_id] if label_id >= 0 else None)
+            for month, day, cents, label_id in zip(batch.row_months, batch.row_days, batch.row_cents, batch.row_labels)]
+    records = [line_parser.reference_record(line) for line in lines]
+    assert rows == [record[1:] for record in records if record[0] != "year"]
+    assert batch.year == [record[4] for record in records if record[0] == "year" and record[4]][-1]
@@ -0,0 +1,18 @@
+import synthetic
+from conftest import answer_other
+
+
+def test_query_engine_counts_only_its_account(workspace):
+    import backend
+    from objects import AllData
+    paths = synthetic.generate(str(workspace / "statements"), statements=4, pages=1)
+    user_data = AllData()
+    backend.import_files(user_data, paths[:2], answer_other, workers=1, progress=lambda *args: None)
+    backend.import_files(user_data, paths[2:], answer_other, workers=1, progress=lambda *args: None,
+                         account="Card")
+
+    totals = {account: backend.get_query_engine(account).year_totals(2024)["total_spent"]
+              for account in (None, "", "Card")}
+    assert totals[""] == user_data.get_year(2024, account="").total_spent
+    assert totals["Card"] == user_data.get_year(2024, account="Card").total_spent
+    assert round(totals[None], 2) == round(totals[""] + totals["Card"], 2)
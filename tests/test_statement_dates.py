@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+import synthetic
+from conftest import answer_other
+from transaction_store import to_days
+
+
+def test_to_days_clamps_the_day():
+    assert to_days(1970, 1, 1) == 0
+    assert to_days(2024, 2, 31) == to_days(2024, 2, 29)
+    assert to_days(2023, 2, 30) == to_days(2023, 2, 28)
+    # "00/00" lines land on the 1st
+    assert to_days(2024, 12, 0) == to_days(2024, 12, 1)
+
+
+@pytest.mark.parametrize("year, month", [(0, 1), (2024, 0), (2024, 13), (10000, 1)])
+def test_to_days_rejects_impossible_months(year, month):
+    with pytest.raises(ValueError):
+        to_days(year, month, 1)
+
+
+def write_statement(path, lines):
+    synthetic.write_pdf(str(path), [lines])
+    return str(path)
+
+
+def statement_without_year(directory):
+    rng = random.Random(0)
+    merchants = synthetic.make_merchants(5, rng)
+    lines = ["Wells Fargo Everyday Checking"]
+    lines += [synthetic.transaction_line(3, rng, merchants) for _ in range(10)]
+    return write_statement(directory / "no_year.pdf", lines)
+
+
+def test_statement_without_fee_period_is_unsupported(workspace):
+    import backend
+    path = statement_without_year(workspace)
+    with pytest.raises(backend.UnsupportedStatement):
+        backend.summarize_statement(path)
+
+
+def test_import_skips_statement_without_fee_period(workspace):
+    import backend
+    from objects import AllData
+    good = synthetic.generate(str(workspace / "good"), statements=1, pages=1)
+    bad = statement_without_year(workspace)
+
+    user_data = AllData()
+    stats = {}
+    imported = backend.import_files(user_data, [bad] + good, answer_other, workers=1,
+                                    progress=lambda *args: None, stats=stats)
+    assert imported == 1
+    assert stats["unsupported"] == 1
+    assert stats["transactions"] > 0
+    assert user_data.get_years() == [2024]
+
+
+def test_rows_with_impossible_months_are_dropped_before_fingerprinting(workspace):
+    import backend
+    from objects import AllData
+    rng = random.Random(0)
+    merchants = synthetic.make_merchants(5, rng)
+    lines = ["Fee period 03/01/2024 - 03/28/2024"]
+    lines += [synthetic.transaction_line(3, rng, merchants) for _ in range(5)]
+    lines.append("13/05 Purchase authorized on 13/05 Misread Store 12 Card 1234 9.99")
+    path = write_statement(workspace / "misread.pdf", lines)
+
+    user_data = AllData()
+    stats = {}
+    backend.import_files(user_data, [path], answer_other, workers=1, progress=lambda *args: None, stats=stats)
+    assert stats["transactions"] == 5
+    assert len(backend.get_transaction_store()) == 5
+
+
+def test_replay_skips_journal_entries_without_a_year(workspace):
+    import backend
+    from journal import statement_entry
+    from objects import StatementSummary
+    summary = StatementSummary()
+    summary.append(3, 1, 999, "Corner Store")
+    backend.get_ingest_journal().append({"statements": [statement_entry(summary, "ab" * 32, [1])],
+                                         "categories": {"Corner Store": "Other"}})
+
+    user_data = backend.load_user_data()
+    assert user_data.journal_seq == 1
+    assert user_data.get_years() == []
+    assert len(backend.get_transaction_store()) == 0
@@ -0,0 +1,42 @@
+import pytest
+
+import synthetic
+from conftest import answer_other
+
+
+def corrupt_copy(path, directory):
+    with open(path, "rb") as file:
+        data = file.read()
+    corrupt = directory / "truncated.pdf"
+    corrupt.write_bytes(data[:len(data) // 2])
+    return str(corrupt)
+
+
+def test_truncated_pdf_is_unsupported(workspace):
+    import backend
+    good = synthetic.generate(str(workspace / "good"), statements=1, pages=1)
+    with pytest.raises(backend.UnsupportedStatement):
+        backend.summarize_statement(corrupt_copy(good[0], workspace))
+
+
+def test_truncated_pdf_does_not_stop_the_batch(workspace):
+    import backend
+    from objects import AllData
+    good = synthetic.generate(str(workspace / "good"), statements=2, pages=1)
+    corrupt = corrupt_copy(good[0], workspace)
+
+    stats = {}
+    imported = backend.import_files(AllData(), [corrupt] + good, answer_other, workers=1,
+                                    progress=lambda *args: None, stats=stats)
+    assert imported == 2
+    assert stats["unsupported"] == 1
+
+
+def test_truncated_pdf_in_a_worker_pool(workspace):
+    import backend
+    good = synthetic.generate(str(workspace / "good"), statements=2, pages=1)
+    corrupt = corrupt_copy(good[0], workspace)
+
+    summaries = backend.summarize_statements([corrupt] + good, workers=2, progress=lambda *args: None)
+    assert summaries[0] is None
+    assert all(summary is not None for summary in summaries[1:])
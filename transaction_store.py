@@ -0,0 +1,264 @@
+import calendar
+import json
+import os
+from array import array
+from datetime import MAXYEAR, MINYEAR, date
+
+import numpy as np
+
+from atomic_file import atomic_write_bytes, atomic_write_json
+from objects import DEFAULT_ACCOUNT, AggregateDelta, YearData
+
+# Column name -> array/NumPy typecode. Each column is one raw binary file.
+COLUMNS = {
+    "date": 'i',      # days since 1970-01-01
+    "amount": 'q',    # cents
+    "category": 'h',  # index into categories, DEPOSIT for deposits
+    "merchant": 'i',  # index into merchants, -1 for deposits
+    "source": 'i',    # index into sources (statement file hashes)
+}
+# A statement's account is kept per source in meta.json rather than per row
+DEPOSIT = -1
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def is_valid_month(year, month):
+    return MINYEAR <= year <= MAXYEAR and 1 <= month <= 12
+
+
+def to_days(year, month, day):
+    """Days since the epoch, clamping the day into the month ("00/00" lines land on the 1st).
+
+    Raises ValueError for a year or month no date can have, e.g. year 0 from
+    a statement without a fee period line.
+    """
+    if not is_valid_month(year, month):
+        raise ValueError(f"Not a valid month: {year}-{month:02d}")
+    day = min(max(1, day), calendar.monthrange(year, month)[1])
+    return date(year, month, day).toordinal() - EPOCH_ORDINAL
+
+
+class TransactionStore:
+    """Append-only columnar store of every parsed transaction.
+
+    Each column is a flat binary file that is memory-mapped on load, so a
+    long history is never turned into one Python object per row. New rows
+    collect in array buffers until flush() appends them to the files. The
+    row count in meta.json is written last, so a crash mid-flush only leaves
+    bytes past the committed length, which are ignored and truncated.
+    """
+
+    def __init__(self, directory="transactions"):
+        self.directory = directory
+        self.rows = 0
+        self.categories = []
+        self.merchants = []
+        self.sources = []
+        self.source_accounts = []
+        self.category_ids = {}
+        self.merchant_ids = {}
+        self.source_ids = {}
+        self.mapped = {name: np.empty(0, dtype=typecode) for name, typecode in COLUMNS.items()}
+        self.pending = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.loaded = False
+        # Bumped whenever stored rows change other than by appending, so caches keyed on it go stale
+        self.version = 0
+
+    def column_path(self, name):
+        return os.path.join(self.directory, name + ".bin")
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        meta_path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+
+        with open(meta_path, 'r') as file:
+            meta = json.load(file)
+        self.rows = meta["rows"]
+        self.categories = meta["categories"]
+        self.merchants = meta["merchants"]
+        self.sources = meta["sources"]
+        self.source_accounts = meta.get("source_accounts", [DEFAULT_ACCOUNT] * len(self.sources))
+        self.category_ids = {name: i for i, name in enumerate(self.categories)}
+        self.merchant_ids = {name: i for i, name in enumerate(self.merchants)}
+        self.source_ids = {name: i for i, name in enumerate(self.sources)}
+        self.map_columns()
+
+    def map_columns(self):
+        for name, typecode in COLUMNS.items():
+            if self.rows:
+                self.mapped[name] = np.memmap(self.column_path(name), dtype=typecode, mode='r', shape=(self.rows,))
+            else:
+                self.mapped[name] = np.empty(0, dtype=typecode)
+
+    def __len__(self):
+        self.load()
+        return self.rows + len(self.pending["date"])
+
+    def intern(self, values, ids, value):
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def append(self, days, cents, category, merchant, source, account=DEFAULT_ACCOUNT):
+        """Append one row. category/merchant are names (None for a deposit), source is a file hash."""
+        self.load()
+        if source not in self.source_ids:
+            self.source_accounts.append(account)
+        pending = self.pending
+        pending["date"].append(days)
+        pending["amount"].append(cents)
+        if category is None:
+            pending["category"].append(DEPOSIT)
+            pending["merchant"].append(-1)
+        else:
+            pending["category"].append(self.intern(self.categories, self.category_ids, category))
+            pending["merchant"].append(self.intern(self.merchants, self.merchant_ids, merchant))
+        pending["source"].append(self.intern(self.sources, self.source_ids, source))
+
+    def append_summary(self, summary, label_categories, source):
+        """Append the raw rows of a StatementSummary once its labels are categorized."""
+        labels = list(summary.label_ids)
+        for month, day, cents, label_id in zip(summary.row_months, summary.row_days,
+                                               summary.row_cents, summary.row_labels):
+            # Month 0 ("00/00") is counted as December, like the month totals
+            days = to_days(summary.year, month if month > 0 else 12, day)
+            if label_id < 0:
+                self.append(days, cents, None, None, source, summary.account)
+            else:
+                label = labels[label_id]
+                self.append(days, cents, label_categories[label], label, source, summary.account)
+
+    def flush(self):
+        self.load()
+        added = len(self.pending["date"])
+        if not added:
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        for name, typecode in COLUMNS.items():
+            path = self.column_path(name)
+            with open(path, 'ab') as file:
+                # Drop anything past the committed length left by an interrupted flush
+                file.truncate(self.rows * self.pending[name].itemsize)
+                self.pending[name].tofile(file)
+                file.flush()
+                os.fsync(file.fileno())
+
+        self.rows += added
+        self.write_meta()
+
+        self.pending = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.map_columns()
+
+    def write_meta(self):
+        atomic_write_json(os.path.join(self.directory, "meta.json"), {
+            "rows": self.rows,
+            "categories": self.categories,
+            "merchants": self.merchants,
+            "sources": self.sources,
+            "source_accounts": self.source_accounts,
+        }, indent=None)
+
+    def recategorize(self, merchant_categories):
+        """Give every row of a merchant in merchant_categories (name -> category) that category.
+
+        Rows of other merchants and deposits keep theirs. The category column
+        is replaced as a whole after meta.json lists any new categories, so a
+        crash leaves either the old or the new column. Returns how many rows
+        changed.
+        """
+        self.flush()
+        if not self.rows:
+            return 0
+        keep = -2
+        # One entry per merchant id, plus a last one that merchant id -1 (deposits) picks
+        new_ids = np.array([self.intern(self.categories, self.category_ids, merchant_categories[merchant])
+                            if merchant_categories.get(merchant) is not None else keep
+                            for merchant in self.merchants] + [keep], dtype=np.int64)
+        categories = np.array(self.column("category"), dtype=np.int64)
+        new = new_ids[self.column("merchant")]
+        changed = (new != keep) & (new != categories)
+        if not changed.any():
+            return 0
+
+        categories[changed] = new[changed]
+        self.write_meta()
+        self.mapped["category"] = np.empty(0, dtype=COLUMNS["category"])
+        atomic_write_bytes(self.column_path("category"), categories.astype(COLUMNS["category"]).tobytes())
+        self.map_columns()
+        self.version += 1
+        return int(changed.sum())
+
+    def column(self, name):
+        self.load()
+        pending = self.pending[name]
+        if not len(pending):
+            return self.mapped[name]
+        return np.concatenate([self.mapped[name], np.frombuffer(pending, dtype=pending.typecode)])
+
+    def has_source(self, source):
+        """Whether rows from the statement with file hash source were appended."""
+        self.load()
+        return source in self.source_ids
+
+    def source_account(self, source):
+        """Account of the statement with file hash source."""
+        self.load()
+        if source not in self.source_ids:
+            return DEFAULT_ACCOUNT
+        return self.source_accounts[self.source_ids[source]]
+
+    def deltas(self, rows=None):
+        """Build one AggregateDelta per account-year from the rows selected by a boolean mask."""
+        days = self.column("date")
+        amounts = self.column("amount")
+        categories = self.column("category")
+        sources = self.column("source")
+        if rows is not None:
+            days, amounts, categories, sources = days[rows], amounts[rows], categories[rows], sources[rows]
+        accounts = sorted(set(self.source_accounts))
+        account_ids = {account: i for i, account in enumerate(accounts)}
+        source_account_ids = np.array([account_ids[account] for account in self.source_accounts] or [0],
+                                      dtype=np.int64)
+        row_accounts = source_account_ids[sources]
+
+        dates = days.astype('datetime64[D]')
+        years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        months = dates.astype('datetime64[M]').astype(np.int64) % 12
+        is_deposit = categories == DEPOSIT
+        category_ids = np.where(is_deposit, 0, categories).astype(np.int64)
+        cell_count = 12 * max(len(self.categories), 1)
+
+        deltas = []
+        for account_id, year in np.unique(np.stack([row_accounts, years], axis=1), axis=0):
+            in_year = (years == year) & (row_accounts == account_id)
+            spent = in_year & ~is_deposit
+            earned = in_year & is_deposit
+
+            spent_cells = np.zeros(cell_count, dtype=np.int64)
+            np.add.at(spent_cells, months[spent] * max(len(self.categories), 1) + category_ids[spent], amounts[spent])
+            spent_cells = spent_cells.reshape(12, -1)
+            earned_months = np.zeros(12, dtype=np.int64)
+            np.add.at(earned_months, months[earned], amounts[earned])
+
+            delta = AggregateDelta(int(year), accounts[account_id])
+            for index, category_id in zip(*np.nonzero(spent_cells)):
+                delta.add_spent(int(index), self.categories[category_id], int(spent_cells[index, category_id]))
+            delta.earned = [int(cents) for cents in earned_months]
+            deltas.append(delta)
+        return deltas
+
+    def rebuild_years(self):
+        """Recompute YearData aggregates from the raw rows in vectorized form."""
+        year_list = []
+        for delta in self.deltas():
+            year_data = YearData(delta.year, delta.account)
+            year_data.apply_delta(delta)
+            year_list.append(year_data)
+        return year_list
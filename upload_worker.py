@@ -0,0 +1,81 @@
+import queue
+import threading
+
+from backend import DEFAULT_ACCOUNT, UploadCancelled, import_files
+
+
+class Reply:
+    """A value handed back from the GUI thread to the worker."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+    def set(self, value=None):
+        self.value = value
+        self.event.set()
+
+    def wait(self, cancel):
+        while not self.event.wait(0.1):
+            if cancel.is_set():
+                raise UploadCancelled()
+        return self.value
+
+
+class UploadWorker:
+    """Runs import_files on a background thread.
+
+    Nothing here touches Tk. The worker posts (kind, payload) messages on
+    self.messages and the GUI drains them with root.after:
+
+        ("progress", (stage, done, total))
+        ("ask", (label, categories, reply))   answer with reply.set(category)
+        ("apply", (fn, reply))                 run fn(), then reply.set(), or reply.set(error) if it raised
+        ("done", (count, stats)) / ("cancelled", None) / ("error", message)
+
+    stats are the counts import_files collected, duplicates and unsupported
+    files included.
+    """
+
+    def __init__(self, user_data, paths, workers=None, account=DEFAULT_ACCOUNT):
+        self.user_data = user_data
+        self.paths = paths
+        self.account = account
+        self.workers = workers
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            stats = {}
+            count = import_files(self.user_data, self.paths, self.ask_user, self.workers,
+                                 progress=self.report_progress, cancel=self.cancel_event,
+                                 apply=self.run_on_gui_thread, stats=stats, account=self.account)
+            self.messages.put(("done", (count, stats)))
+        except UploadCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", str(e)))
+
+    def report_progress(self, stage, done, total):
+        self.messages.put(("progress", (stage, done, total)))
+
+    def ask_user(self, label, categories):
+        reply = Reply()
+        self.messages.put(("ask", (label, categories, reply)))
+        return reply.wait(self.cancel_event)
+
+    def run_on_gui_thread(self, fn):
+        # Once the data is being applied the upload can no longer be cancelled
+        reply = Reply()
+        self.messages.put(("apply", (fn, reply)))
+        reply.event.wait()
+        if reply.value is not None:
+            raise reply.value